@@ -1,19 +1,80 @@
 import fitz
 import os
+import sys
 from typing import List, Tuple, Union
 from LinkIdentification.Link import Link
 from LinkIdentification.Page import Page
 
+class _FormattedNumbers(dict):
+    """
+    Maps numbers to their text rounded to a number of digits after the decimal point, without trailing zeros.
+    Each number is formatted on its first lookup only.
+    """
+    __slots__ = ('format_spec',)
+
+    def __init__(self, precision: int):
+        super().__init__()
+        self.format_spec = f".{precision}f"
+
+    def __missing__(self, value: float) -> str:
+        if value % 1 == 0:
+            # Most coordinates in rendered pages are whole numbers, which need no rounding
+            text = str(int(value))
+        else:
+            text = format(value, self.format_spec)
+            if "." in text:
+                text = text.rstrip("0").rstrip(".")
+            if text == "-0":
+                text = "0"
+        self[value] = text
+        return text
+
+
 class Document:
-    def __init__(self, local_file_path: str):
+    def __init__(self, local_file_path: str, stream: bytes = None):
+        """
+        :param local_file_path: Path of the PDF file. Its filename identifies the document.
+        :param stream: Contents of the PDF file, if already in memory, so it is not read from disk again
+        """
         self.local_file_path = local_file_path
+        self.stream = stream
         # Get the filename with extension
         self.filename = os.path.basename(self.local_file_path)
         self.pages: List[Page] = []
         self._load_document()
 
+    @classmethod
+    def from_regions(cls, local_file_path: str, regions: List[Tuple[float, float, float, float]],
+                     links: List[Tuple[float, float, float, float, str]]) -> "Document":
+        """
+        Create a document from links found without a PDF, e.g. in the DOM of a captured webpage.
+        :param local_file_path: Path of the file the links belong to. Its filename identifies the document.
+        :param regions: (x, y, width, height) of each page within the source, e.g. the tiles of a screenshot
+        :param links: (x, y, width, height, uri) of each link within the source
+        """
+        document = cls.__new__(cls)
+        document.local_file_path = local_file_path
+        document.stream = None
+        document.filename = os.path.basename(local_file_path)
+        document.pages = []
+        for page_number, (region_x, region_y, region_width, region_height) in enumerate(regions):
+            page = Page(page_number, (region_width, region_height))
+            for x, y, width, height, uri in links:
+                # Links that cross the edge of the region are cut to the part inside it
+                x0, y0 = max(x, region_x), max(y, region_y)
+                x1, y1 = min(x + width, region_x + region_width), min(y + height, region_y + region_height)
+                if x0 < x1 and y0 < y1:
+                    page.add_link(Link(uri, (x0 - region_x, y0 - region_y, x1 - region_x, y1 - region_y),
+                                       region_width, region_height))
+            page.build_index()
+            document.pages.append(page)
+        return document
+
     def _load_document(self):
-        doc = fitz.open(self.local_file_path)
+        if self.stream is not None:
+            doc = fitz.open(stream=self.stream, filetype="pdf")
+        else:
+            doc = fitz.open(self.local_file_path)
         for page in doc:
             page_obj = Page(page.number, (page.rect.width, page.rect.height))
             page_links = page.get_links()
@@ -29,21 +90,50 @@ class Document:
                         page.rect.height
                     )
                     page_obj.add_link(link_obj)
+            page_obj.build_index()
             self.pages.append(page_obj)
         doc.close()
+        # The links are extracted, so don't keep the PDF's contents alive
+        self.stream = None
 
     def get_url_at_position(self, x: float, y: float, normalized_coordinates: bool, page_index: int) -> Union[str, None]:
         if page_index < 0 or page_index >= len(self.pages):
             return None
-        page = self.pages[page_index]
-        for link in page.links:
-            if normalized_coordinates:
-                if link.normalized_bounds[0] <= x <= link.normalized_bounds[2] and link.normalized_bounds[1] <= y <= link.normalized_bounds[3]:
-                    return link.uri
-            else:
-                if link.bounds[0] <= x <= link.bounds[2] and link.bounds[1] <= y <= link.bounds[3]:
-                    return link.uri
-        return None
+        link = self.pages[page_index].get_link_at_position(x, y, normalized_coordinates)
+        return link.uri if link else None
+
+    def get_resonite_string(self, precision: int = None) -> str:
+        """
+        Encode the link map of this document in the same |-delimited format as link_identifier.Document.get_resonite_string:
+        PAGE_COUNT|PAGE0_WIDTH|PAGE0_HEIGHT|PAGE0_LINK_COUNT|LINK0_X_ORIGIN|LINK0_Y_ORIGIN|LINK0_WIDTH|LINK0_HEIGHT|LINK0_URI|...
+        The parts are collected in one pass and joined once, so encoding is linear in the number of links.
+        :param precision: Digits after the decimal point of the page and link dimensions, or None to not round them
+        """
+        parts = [f"{len(self.pages)}"]
+        if precision is None:
+            for page in self.pages:
+                parts.append(f"|{page.size[0]}|{page.size[1]}|{len(page.links)}|")
+                for link in page.links:
+                    # A | in a URI would end the field early, so it is percent-encoded, which is equivalent in a URL
+                    uri = link.uri if "|" not in link.uri else link.uri.replace("|", "%7C")
+                    parts.append(f"{link.bounds[0]}|{link.bounds[1]}|{link.bounds_width}|{link.bounds_height}|{uri}|")
+            return "".join(parts)
+
+        # Links share most of their x origins, widths and heights, so each distinct value is formatted only once
+        numbers = _FormattedNumbers(precision)
+        for page in self.pages:
+            parts.append(f"|{numbers[page.size[0]]}|{numbers[page.size[1]]}|{len(page.links)}|")
+            for link in page.links:
+                uri = link.uri if "|" not in link.uri else link.uri.replace("|", "%7C")
+                parts.append(f"{numbers[link.bounds[0]]}|{numbers[link.bounds[1]]}|"
+                             f"{numbers[link.bounds_width]}|{numbers[link.bounds_height]}|{uri}|")
+        return "".join(parts)
+
+    def approximate_size(self) -> int:
+        """
+        :return: An estimate of the memory used by this document's pages and links, in bytes
+        """
+        return sys.getsizeof(self) + sys.getsizeof(self.pages) + sum(page.approximate_size() for page in self.pages)
 
     def __repr__(self):
         return f"Document(path={self.local_file_path}, pages={self.pages})"
\ No newline at end of file
@@ -1,17 +1,84 @@
 from LinkIdentification.Document import Document
+from collections import OrderedDict
 from typing import List, Dict, Union
+import logging
 import os
+import threading
 
 class DocumentCollection:
-    def __init__(self):
-        # A dict of filename to Document
-        self.documents: Dict[str, Document] = {}
+    def __init__(self, max_documents: int = None, max_bytes: int = None):
+        """
+        :param max_documents: Maximum number of documents to keep, or None for no limit
+        :param max_bytes: Maximum approximate memory used by the kept documents, or None for no limit
+        """
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # A dict of filename to Document, ordered from least to most recently used
+        self.documents: "OrderedDict[str, Document]" = OrderedDict()
+        # A dict of filename to the document's approximate size in bytes
+        self.document_sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
-    def add_document(self, local_file_path: str):
-        if not os.path.exists(local_file_path):
+    def add_document(self, local_file_path: str, stream: bytes = None):
+        """
+        :param local_file_path: Path of the PDF file
+        :param stream: Contents of the PDF file, if already in memory. The file doesn't need to exist yet.
+        """
+        if stream is None and not os.path.exists(local_file_path):
             raise FileNotFoundError(f"File not found at path: {local_file_path}")
-        document = Document(local_file_path=local_file_path)
-        self.documents[document.filename] = document
+        self.add(Document(local_file_path=local_file_path, stream=stream))
+
+    def add(self, document: Document):
+        document_size = document.approximate_size()
+
+        with self.lock:
+            self._remove(document.filename)
+            self.documents[document.filename] = document
+            self.document_sizes[document.filename] = document_size
+            self.total_bytes += document_size
+            self._evict()
+
+    def _remove(self, filename: str) -> bool:
+        document = self.documents.pop(filename, None)
+        if document is None:
+            return False
+        self.total_bytes -= self.document_sizes.pop(filename)
+        return True
+
+    def _evict(self):
+        # Always keep the most recently added document, even if it alone exceeds the limits
+        while len(self.documents) > 1 and (
+                (self.max_documents is not None and len(self.documents) > self.max_documents) or
+                (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+            filename = next(iter(self.documents))
+            self._remove(filename)
+            self.evictions += 1
+            logging.info(f"Evicted least recently used document from the collection: {filename}")
+
+    def remove_document(self, filename: str) -> bool:
+        with self.lock:
+            return self._remove(filename)
 
     def get_document_by_filename(self, filename: str) -> Union[Document, None]:
-        return self.documents.get(filename, None)
\ No newline at end of file
+        with self.lock:
+            document = self.documents.get(filename, None)
+            if document is None:
+                self.misses += 1
+                return None
+            self.documents.move_to_end(filename)
+            self.hits += 1
+            return document
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "documents": len(self.documents),
+                "approximate_bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,6 +1,10 @@
+import sys
 from typing import List, Tuple, Union
 
 class Link:
+    # Documents can hold thousands of links, so avoid a per-instance __dict__
+    __slots__ = ('uri', 'bounds', 'bounds_width', 'bounds_height', 'normalized_bounds')
+
     def __init__(self, uri: str, bounds: Tuple[float, float, float, float], page_width: float, page_height: float):
         self.uri = uri
         self.bounds = bounds  # (x0, y0, x1, y1)
@@ -14,5 +18,10 @@ class Link:
             bounds[3] / page_height
         )
 
+    def approximate_size(self) -> int:
+        # The object itself, its URI, and both bounds tuples with their floats
+        return (sys.getsizeof(self) + sys.getsizeof(self.uri)
+                + 2 * (sys.getsizeof(self.bounds) + 4 * sys.getsizeof(0.0)))
+
     def __repr__(self):
         return f"Link(uri={self.uri}, bounds={self.bounds}, normalized_bounds={self.normalized_bounds}, bounds_width={self.bounds_width}, bounds_height={self.bounds_height})"
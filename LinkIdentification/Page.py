@@ -1,14 +1,100 @@
+import math
+import sys
+from array import array
 from typing import List, Tuple, Union
 from LinkIdentification.Link import Link
 
+# Pages with at most this many links use a single grid cell, since scanning them is cheaper than bucketing
+LINEAR_SCAN_MAX_LINKS = 16
+# Maximum number of grid cells along each axis of a page's spatial index
+MAX_GRID_CELLS = 64
+
 class Page:
+    __slots__ = ('number', 'size', 'links', '_normalized_bounds', '_grid', '_grid_cells')
+
     def __init__(self, number: int, size: Tuple[float, float]):
         self.number = number
         self.size = size  # (width, height)
         self.links: List[Link] = []
+        # Spatial index over the links' normalized bounds, built lazily by build_index
+        self._normalized_bounds: Union[array, None] = None
+        self._grid: Union[List[array], None] = None
+        self._grid_cells = 0
 
     def add_link(self, link: Link):
         self.links.append(link)
+        # The index no longer covers every link
+        self._grid = None
+
+    def _get_cell(self, normalized_coordinate: float) -> int:
+        cell = math.floor(normalized_coordinate * self._grid_cells)
+        return min(max(cell, 0), self._grid_cells - 1)
+
+    def build_index(self):
+        """
+        Bucket the links into a uniform grid over the normalized page, so hit-testing only checks the links
+        whose bounds overlap the cell containing the point.
+        """
+        if len(self.links) <= LINEAR_SCAN_MAX_LINKS:
+            self._grid_cells = 1
+        else:
+            self._grid_cells = min(math.ceil(math.sqrt(len(self.links))), MAX_GRID_CELLS)
+        # Flat array of x0, y0, x1, y1 per link, in link order
+        self._normalized_bounds = array('d')
+        grid = [array('I') for _ in range(self._grid_cells * self._grid_cells)]
+
+        for link_index, link in enumerate(self.links):
+            x0, y0, x1, y1 = link.normalized_bounds
+            self._normalized_bounds.extend((x0, y0, x1, y1))
+            for cell_y in range(self._get_cell(y0), self._get_cell(y1) + 1):
+                row_offset = cell_y * self._grid_cells
+                for cell_x in range(self._get_cell(x0), self._get_cell(x1) + 1):
+                    # Link indices are appended in increasing order, so every cell stays sorted
+                    grid[row_offset + cell_x].append(link_index)
+
+        self._grid = grid
+
+    def get_link_at_position(self, x: float, y: float, normalized_coordinates: bool) -> Union[Link, None]:
+        """
+        :return: The first link, in document order, whose bounds contain the position, or None
+        """
+        if self._grid is None:
+            self.build_index()
+
+        if self._grid_cells == 1:
+            # Few links, so scan them directly
+            for link in self.links:
+                bounds = link.normalized_bounds if normalized_coordinates else link.bounds
+                if bounds[0] <= x <= bounds[2] and bounds[1] <= y <= bounds[3]:
+                    return link
+            return None
+
+        if normalized_coordinates:
+            normalized_x, normalized_y = x, y
+        else:
+            normalized_x, normalized_y = x / self.size[0], y / self.size[1]
+
+        cell = self._get_cell(normalized_y) * self._grid_cells + self._get_cell(normalized_x)
+        bounds = self._normalized_bounds
+        for link_index in self._grid[cell]:
+            if normalized_coordinates:
+                offset = link_index * 4
+                if bounds[offset] <= x <= bounds[offset + 2] and bounds[offset + 1] <= y <= bounds[offset + 3]:
+                    return self.links[link_index]
+            else:
+                # Compare against the original bounds so the result matches the unnormalized coordinates exactly
+                link = self.links[link_index]
+                if link.bounds[0] <= x <= link.bounds[2] and link.bounds[1] <= y <= link.bounds[3]:
+                    return link
+        return None
+
+    def approximate_size(self) -> int:
+        size = (sys.getsizeof(self) + sys.getsizeof(self.size) + sys.getsizeof(self.links)
+                + sum(link.approximate_size() for link in self.links))
+        if self._grid is not None:
+            size += (sys.getsizeof(self._normalized_bounds) + sys.getsizeof(self._grid)
+                     + sum(sys.getsizeof(cell) for cell in self._grid))
+        return size
 
     def __repr__(self):
         return f"Page(number={self.number}, size={self.size}, links={self.links})"
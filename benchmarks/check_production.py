@@ -0,0 +1,82 @@
+"""
+Checks that the production mode starts: runs `main.py --production`, waits until the API answers /metrics,
+then stops it with SIGTERM, like systemd does, and checks that it and its render worker processes exit.
+The render workers don't need a working browser for this check.
+
+Run from the root of this repo, next to a config.ini:
+python -m benchmarks.check_production
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import main
+
+
+def wait_for_metrics(process: subprocess.Popen, timeout_seconds: float) -> bool:
+    """
+    :return: Whether the API answered /metrics before the timeout, or before the process exited
+    """
+    url = f"http://127.0.0.1:{main.PORT}/metrics"
+    deadline = time.time() + timeout_seconds
+    while time.time() < deadline and process.poll() is None:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def get_render_worker_pids() -> list:
+    with urllib.request.urlopen(f"http://127.0.0.1:{main.PORT}/driver-stats", timeout=5) as response:
+        return [worker["pid"] for worker in json.load(response)["processes"]]
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that main.py --production starts and stops.")
+    parser.add_argument('--timeout', type=float, default=60, help="Seconds to wait for the server to start, and to stop.")
+    args = parser.parse_args()
+
+    process = subprocess.Popen([sys.executable, "main.py", "--production"])
+    try:
+        if not wait_for_metrics(process, args.timeout):
+            print(f"main.py --production did not answer /metrics within {args.timeout} seconds "
+                  f"(exit code {process.poll()}).")
+            sys.exit(1)
+        render_worker_pids = get_render_worker_pids()
+        print(f"main.py --production is serving on port {main.PORT} with render worker processes {render_worker_pids}.")
+
+        process.send_signal(signal.SIGTERM)
+        try:
+            exit_code = process.wait(args.timeout)
+        except subprocess.TimeoutExpired:
+            print(f"main.py --production did not exit within {args.timeout} seconds of SIGTERM.")
+            sys.exit(1)
+        if exit_code != 0:
+            print(f"main.py --production exited with code {exit_code}.")
+            sys.exit(1)
+        running_pids = [pid for pid in render_worker_pids if is_running(pid)]
+        if running_pids:
+            print(f"Render worker processes {running_pids} are still running.")
+            sys.exit(1)
+        print("main.py --production stopped cleanly.")
+    finally:
+        if process.poll() is None:
+            os.kill(process.pid, signal.SIGKILL)
@@ -0,0 +1,211 @@
+"""
+Stands in for a Chrome WebDriver, so benchmarks can measure the Python side of a conversion without a browser.
+Navigation makes real HTTP requests, following redirects itself and recording the CDP events Chrome would log.
+Page.printToPDF returns a PDF made with PyMuPDF that has a link for every <a> on the page,
+and Page.captureScreenshot returns a blank image the size of the clipped region.
+Clicking a link records the CDP events of navigating to it, without loading it or leaving the current page.
+"""
+import base64
+import itertools
+import json
+import math
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, List, Tuple
+
+import fitz  # PyMuPDF
+
+PAGE_WIDTH = 360.0
+PAGE_HEIGHT = 800.0
+VIEWPORT_WIDTH = 1080
+LINK_HEIGHT = 12.0
+MAX_REDIRECTS = 20
+
+ANCHOR_PATTERN = re.compile(r'<a href="([^"]+)"')
+ANCHOR_TOP_PATTERN = re.compile(r'<a href="([^"]+)"(?: style="position:absolute;top:(\d+)px")?')
+BODY_HEIGHT_PATTERN = re.compile(r'<body style="height:(\d+)px')
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    # Redirects are followed by FakeDriver.get, so each hop can be recorded like Chrome does
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class FakeDriver:
+    FRAME_ID = "fake-main-frame"
+
+    def __init__(self):
+        self.current_url = "about:blank"
+        self.page_html = ""
+        self.performance_log: List[dict] = []
+        self.request_ids = itertools.count(1)
+        self.opener = urllib.request.build_opener(NoRedirectHandler)
+        # A dict of page HTML to the PDF printed from it, so repeated conversions measure the converter, not PyMuPDF
+        self.pdf_cache: Dict[str, bytes] = {}
+        # A dict of stream handle to (PDF, read offset)
+        self.streams: Dict[str, Tuple[bytes, int]] = {}
+
+    def log_event(self, method: str, params: dict):
+        self.performance_log.append({"message": json.dumps({"message": {"method": method, "params": params}}),
+                                     "timestamp": time.time() * 1000})
+
+    def get_log(self, log_type: str) -> List[dict]:
+        entries = self.performance_log
+        self.performance_log = []
+        return entries
+
+    def get(self, url: str):
+        request_id = str(next(self.request_ids))
+        self.log_event("Page.frameStartedLoading", {"frameId": FakeDriver.FRAME_ID})
+        redirect_response = None
+        for _ in range(MAX_REDIRECTS):
+            request_event = {"requestId": request_id, "type": "Document", "frameId": FakeDriver.FRAME_ID,
+                             "request": {"url": url}}
+            if redirect_response:
+                request_event["redirectResponse"] = redirect_response
+            self.log_event("Network.requestWillBeSent", request_event)
+
+            try:
+                response = self.opener.open(url)
+            except urllib.error.HTTPError as e:
+                # Redirects and error pages both arrive as HTTPError, because redirects aren't followed
+                response = e
+            body = response.read()
+            status = response.getcode()
+            headers = dict(response.headers.items())
+
+            location = headers.get("Location")
+            if 300 <= status < 400 and location:
+                redirect_response = {"url": url, "status": status, "headers": headers}
+                url = urllib.parse.urljoin(url, location)
+                continue
+
+            self.log_event("Network.responseReceived", {"requestId": request_id, "type": "Document",
+                                                        "response": {"url": url, "status": status, "headers": headers}})
+            self.log_event("Network.loadingFinished", {"requestId": request_id, "encodedDataLength": len(body)})
+            break
+
+        self.current_url = url
+        self.page_html = body.decode("utf-8", errors="replace")
+        self.log_event("Page.frameNavigated", {"frame": {"id": FakeDriver.FRAME_ID, "url": url}})
+        self.log_event("Page.loadEventFired", {})
+
+    def log_navigation(self, url: str):
+        # The fixture pages link to other sites, so the navigation is recorded as if it succeeded right away
+        request_id = str(next(self.request_ids))
+        self.log_event("Page.frameStartedLoading", {"frameId": FakeDriver.FRAME_ID})
+        self.log_event("Network.requestWillBeSent", {"requestId": request_id, "type": "Document",
+                                                     "frameId": FakeDriver.FRAME_ID, "request": {"url": url}})
+        self.log_event("Network.responseReceived", {"requestId": request_id, "type": "Document",
+                                                    "response": {"url": url, "status": 200, "headers": {}}})
+        self.log_event("Network.loadingFinished", {"requestId": request_id, "encodedDataLength": 0})
+        self.log_event("Page.frameNavigated", {"frame": {"id": FakeDriver.FRAME_ID, "url": url}})
+        self.log_event("Page.loadEventFired", {})
+
+    def click_at(self, x: float, y: float) -> dict:
+        # Answers WebDriverManager.CLICK_AT_PIXEL_SCRIPT
+        for link_x, link_y, width, height, uri in self.get_link_rects():
+            if link_x <= x < link_x + width and link_y <= y < link_y + height:
+                self.log_navigation(uri)
+                return {"clicked": True, "found": True, "tag": "a", "href": uri}
+        return {"clicked": False, "found": True, "tag": None, "href": None}
+
+    def execute_script(self, script: str, *args):
+        if "elementFromPoint" in script:
+            return self.click_at(*args)
+        if "document.readyState" in script:
+            return "complete"
+        if "fetch(" in script:
+            try:
+                return self.opener.open(args[0]).getcode()
+            except urllib.error.HTTPError as e:
+                return e.code
+        if "scrollHeight" in script:
+            return int(PAGE_HEIGHT * self.get_page_count())
+        if "getClientRects" in script:
+            return self.get_link_rects()
+        return None
+
+    def get_link_rects(self) -> List[list]:
+        # Links without a position are stacked from the top of the page, one per line
+        rects = []
+        for i, (uri, top) in enumerate(ANCHOR_TOP_PATTERN.findall(self.page_html)):
+            y = float(top) if top else i * LINK_HEIGHT
+            rects.append([8.0, y, 60.0, LINK_HEIGHT, uri])
+        return rects
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        if cmd == "Page.getFrameTree":
+            return {"frameTree": {"frame": {"id": FakeDriver.FRAME_ID}}}
+        if cmd == "Page.printToPDF":
+            pdf_data = self.print_to_pdf()
+            if params.get("transferMode") == "ReturnAsStream":
+                handle = str(next(self.request_ids))
+                self.streams[handle] = (pdf_data, 0)
+                return {"stream": handle}
+            return {"data": base64.b64encode(pdf_data).decode("ascii")}
+        if cmd == "IO.read":
+            pdf_data, offset = self.streams[params["handle"]]
+            chunk = pdf_data[offset:offset + params.get("size", 1048576)]
+            self.streams[params["handle"]] = (pdf_data, offset + len(chunk))
+            return {"data": base64.b64encode(chunk).decode("ascii"), "base64Encoded": True,
+                    "eof": offset + len(chunk) >= len(pdf_data)}
+        if cmd == "IO.close":
+            self.streams.pop(params["handle"], None)
+        if cmd == "Page.getLayoutMetrics":
+            return {"cssLayoutViewport": {"pageX": 0, "pageY": 0, "clientWidth": VIEWPORT_WIDTH, "clientHeight": PAGE_HEIGHT},
+                    "cssContentSize": {"x": 0, "y": 0, "width": VIEWPORT_WIDTH, "height": PAGE_HEIGHT * self.get_page_count()}}
+        if cmd == "Page.captureScreenshot":
+            return {"data": base64.b64encode(self.capture_screenshot(params)).decode("ascii")}
+        return {}
+
+    def capture_screenshot(self, params: dict) -> bytes:
+        clip = params["clip"]
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, math.ceil(clip["width"]), math.ceil(clip["height"])), False)
+        pixmap.clear_with(255)
+        # PyMuPDF can't encode webp, so the fake driver returns jpeg instead
+        return pixmap.tobytes("png" if params.get("format", "png") == "png" else "jpeg")
+
+    def get_page_count(self) -> int:
+        height_match = BODY_HEIGHT_PATTERN.search(self.page_html)
+        height_px = int(height_match.group(1)) if height_match else 0
+        return max(1, math.ceil(height_px / PAGE_HEIGHT))
+
+    def print_to_pdf(self) -> bytes:
+        pdf_data = self.pdf_cache.get(self.page_html)
+        if pdf_data is not None:
+            return pdf_data
+
+        uris = ANCHOR_PATTERN.findall(self.page_html)
+        page_count = max(self.get_page_count(), math.ceil(len(uris) * LINK_HEIGHT / PAGE_HEIGHT))
+        links_per_page = math.ceil(len(uris) / page_count) if uris else 0
+
+        document = fitz.open()
+        for page_index in range(page_count):
+            page = document.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+            for i, uri in enumerate(uris[page_index * links_per_page:(page_index + 1) * links_per_page]):
+                rect = fitz.Rect(10, i * LINK_HEIGHT, 10 + 100, (i + 1) * LINK_HEIGHT)
+                page.insert_text((rect.x0, rect.y1 - 2), f"Link {page_index * links_per_page + i}", fontsize=8)
+                page.insert_link({"kind": fitz.LINK_URI, "from": rect, "uri": uri})
+        pdf_data = document.tobytes()
+        document.close()
+
+        self.pdf_cache[self.page_html] = pdf_data
+        return pdf_data
+
+    # The rest of the WebDriver interface the converters use, which does nothing without a browser
+    def set_window_size(self, width: int, height: int):
+        pass
+
+    def set_page_load_timeout(self, seconds: int):
+        pass
+
+    def save_screenshot(self, filename: str) -> bool:
+        return False
+
+    def quit(self):
+        pass
@@ -0,0 +1,90 @@
+"""
+A local website with pages that stress different parts of a conversion,
+so benchmarks don't depend on the internet or on how a real site looks today.
+"""
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fixture name to the path of the page on the fixture site
+FIXTURE_PAGES = {
+    "link_dense": "/links?count=2000",
+    "tall": "/tall?height=60000&count=300",
+    "redirect": "/redirect?hops=3&target=" + urllib.parse.quote("/links?count=50", safe=""),
+    "slow": "/slow?delay=1&count=50",
+}
+
+
+def generate_links_html(title: str, link_count: int, height_px: int = 0) -> str:
+    # Links are spread evenly over the height of the page, or stacked if no height is given
+    spacing_px = height_px // link_count if height_px and link_count else 0
+    links = []
+    for i in range(link_count):
+        style = f' style="position:absolute;top:{i * spacing_px}px"' if spacing_px else ""
+        links.append(f'<a href="https://example.com/{title}/{i}"{style}>Link {i}</a><br>')
+    body_style = f' style="height:{height_px}px;position:relative"' if height_px else ""
+    return (f"<!DOCTYPE html><html><head><title>{title}</title></head>"
+            f"<body{body_style}>{''.join(links)}</body></html>")
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed_url = urllib.parse.urlparse(self.path)
+        arguments = {name: values[0] for name, values in urllib.parse.parse_qs(parsed_url.query).items()}
+        link_count = int(arguments.get("count", 50))
+
+        if parsed_url.path == "/links":
+            self.send_html(generate_links_html("links", link_count))
+        elif parsed_url.path == "/tall":
+            self.send_html(generate_links_html("tall", link_count, int(arguments.get("height", 20000))))
+        elif parsed_url.path == "/redirect":
+            hops = int(arguments.get("hops", 1))
+            target = arguments.get("target", "/links")
+            if hops > 1:
+                location = f"/redirect?hops={hops - 1}&target={urllib.parse.quote(target, safe='')}"
+            else:
+                location = target
+            self.send_response(302)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif parsed_url.path == "/slow":
+            time.sleep(float(arguments.get("delay", 1)))
+            self.send_html(generate_links_html("slow", link_count))
+        else:
+            self.send_error(404)
+
+    def send_html(self, html: str):
+        body = html.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", f'"{hash(body) & 0xffffffff:x}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Request logs would drown out the benchmark results
+        pass
+
+
+class FixtureSite:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        """
+        :param port: 0 picks a free port
+        """
+        self.server = ThreadingHTTPServer((host, port), FixtureRequestHandler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="FixtureSite", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_url(self, path: str) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{path}"
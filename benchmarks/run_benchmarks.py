@@ -0,0 +1,300 @@
+"""
+Offline benchmark suite. Serves the fixture pages from a local HTTP server and times:
+- PDFConverter.convert_webpage for each fixture page
+- ImageConverter.convert_webpage for each fixture page, which captures it as image tiles
+- Loading a rendered PDF into a Document
+- Document.get_url_at_position
+- Encoding a rendered PDF's links as a Resonite string, as link_identifier does and as /link-map does
+- WebDriverManager.click_at_pixel on a link of each fixture page, including the wait for the navigation it causes
+
+With --driver fake (the default), no browser is started, so the results show the Python overhead of a conversion.
+With --driver chrome, a real Chrome renders the fixture pages.
+
+Run from the root of this repo, next to a config.ini:
+python -m benchmarks.run_benchmarks --output benchmark_results.json
+python -m benchmarks.run_benchmarks --compare benchmark_results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Union
+
+import link_identifier
+import main
+from LinkIdentification.Document import Document
+from benchmarks.fake_driver import FakeDriver
+from benchmarks.fixture_site import FIXTURE_PAGES, FixtureSite
+
+CLICK_QUERY_COUNT = 10000
+# Encoding takes well under a millisecond for small documents, so each iteration repeats it to get stable timings
+RESONITE_STRING_REPETITIONS = 100
+
+
+def summarize(durations: List[float], items_per_iteration: int = 1) -> dict:
+    """
+    :param durations: Seconds taken by each iteration
+    :param items_per_iteration: Operations timed together in one iteration, e.g. click lookups
+    """
+    sorted_durations = sorted(durations)
+    median_seconds = statistics.median(sorted_durations)
+    return {
+        "iterations": len(durations),
+        "mean_seconds": statistics.fmean(sorted_durations),
+        "median_seconds": median_seconds,
+        "p95_seconds": sorted_durations[min(len(sorted_durations) - 1, int(len(sorted_durations) * 0.95))],
+        "min_seconds": sorted_durations[0],
+        "items_per_iteration": items_per_iteration,
+        "median_seconds_per_item": median_seconds / items_per_iteration,
+    }
+
+
+def time_iterations(function, iterations: int) -> List[float]:
+    durations = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+
+def create_web_driver_manager(driver_mode: str) -> main.WebDriverManager:
+    if driver_mode == "chrome":
+        return main.WebDriverManager(webpage_timeout_seconds=main.WEBPAGE_TIMEOUT_SECONDS)
+    # Skips starting Chrome, and only sets up what the converter uses
+    web_driver_manager = main.WebDriverManager.__new__(main.WebDriverManager)
+    web_driver_manager.driver = FakeDriver()
+    web_driver_manager.cdp_event_monitor = main.CdpEventMonitor(web_driver_manager.driver)
+    return web_driver_manager
+
+
+def benchmark_conversions(fixture_site: FixtureSite, driver_mode: str, readiness_mode: str, iterations: int,
+                          storage_dir: str) -> (Dict[str, dict], Dict[str, str]):
+    """
+    :return: The results by benchmark name, and the path of a rendered PDF for each fixture page
+    """
+    results = {}
+    pdf_paths = {}
+    web_driver_manager = create_web_driver_manager(driver_mode)
+    pdf_converter = main.PDFConverter(storage_dir=storage_dir,
+                                      webpage_load_seconds=main.WEBPAGE_LOAD_SECONDS,
+                                      # Keep every render, so a PDF of each fixture page is left for the other benchmarks
+                                      duplicate_pdf_prune_seconds=sys.maxsize,
+                                      stream_pdf_output=main.STREAM_PDF_OUTPUT,
+                                      pdf_stream_chunk_bytes=main.PDF_STREAM_CHUNK_BYTES)
+    render_options = main.RenderOptions(readiness_mode=readiness_mode, blocking_profile='none')
+    try:
+        for fixture_name, path in FIXTURE_PAGES.items():
+            url = fixture_site.get_url(path)
+            # One untimed conversion first, so one-time costs like the fake driver generating the PDF aren't measured
+            pdf_converter.convert_webpage(web_driver_manager.driver, url, render_options=render_options,
+                                          cdp_event_monitor=web_driver_manager.cdp_event_monitor)
+            durations = []
+            for _ in range(iterations):
+                stage_timer = main.StageTimer()
+                start_time = time.perf_counter()
+                safe_filename, status_code = pdf_converter.convert_webpage(web_driver_manager.driver, url,
+                                                                           render_options=render_options,
+                                                                           cdp_event_monitor=web_driver_manager.cdp_event_monitor,
+                                                                           stage_timer=stage_timer)
+                durations.append(time.perf_counter() - start_time)
+                if not safe_filename:
+                    raise RuntimeError(f"Converting the {fixture_name} fixture page failed.")
+                # Let the background link extraction finish, so it doesn't slow down the next iteration
+                pdf_converter.link_extraction_executor.submit(lambda: None).result()
+                pdf_paths[fixture_name] = os.path.join(storage_dir, safe_filename)
+
+            results[f"convert_webpage/{fixture_name}"] = summarize(durations)
+            results[f"convert_webpage/{fixture_name}"]["last_stage_seconds"] = stage_timer.stage_seconds
+            print_result(f"convert_webpage/{fixture_name}", results[f"convert_webpage/{fixture_name}"])
+    finally:
+        web_driver_manager.quit()
+    return results, pdf_paths
+
+
+def benchmark_image_captures(fixture_site: FixtureSite, driver_mode: str, readiness_mode: str, iterations: int,
+                             storage_dir: str) -> Dict[str, dict]:
+    results = {}
+    web_driver_manager = create_web_driver_manager(driver_mode)
+    image_converter = main.ImageConverter(storage_dir=storage_dir,
+                                          webpage_load_seconds=main.WEBPAGE_LOAD_SECONDS,
+                                          duplicate_image_prune_seconds=main.DUPLICATE_IMAGE_PRUNE_SECONDS)
+    render_options = main.RenderOptions(readiness_mode=readiness_mode, blocking_profile='none')
+    try:
+        for fixture_name, path in FIXTURE_PAGES.items():
+            url = fixture_site.get_url(path)
+            durations = []
+            for _ in range(iterations):
+                stage_timer = main.StageTimer()
+                start_time = time.perf_counter()
+                safe_filename, status_code = image_converter.convert_webpage(web_driver_manager.driver, url,
+                                                                             render_options=render_options,
+                                                                             cdp_event_monitor=web_driver_manager.cdp_event_monitor,
+                                                                             stage_timer=stage_timer)
+                durations.append(time.perf_counter() - start_time)
+                if not safe_filename:
+                    raise RuntimeError(f"Capturing the {fixture_name} fixture page failed.")
+
+            results[f"capture_image/{fixture_name}"] = summarize(durations)
+            results[f"capture_image/{fixture_name}"]["last_stage_seconds"] = stage_timer.stage_seconds
+            print_result(f"capture_image/{fixture_name}", results[f"capture_image/{fixture_name}"])
+    finally:
+        web_driver_manager.quit()
+    return results
+
+
+def benchmark_clicks(fixture_site: FixtureSite, driver_mode: str, iterations: int) -> Dict[str, dict]:
+    """
+    With --driver chrome, the clicks follow the fixture pages' links to example.com.
+    """
+    results = {}
+    web_driver_manager = create_web_driver_manager(driver_mode)
+    try:
+        for fixture_name, path in FIXTURE_PAGES.items():
+            url = fixture_site.get_url(path)
+            durations = []
+            for _ in range(iterations):
+                # The click navigates away, so the fixture page is loaded again first, untimed
+                web_driver_manager.driver.get(url)
+                links = web_driver_manager.driver.execute_script(main.ImageConverter.GET_LINKS_SCRIPT)
+                if not links:
+                    raise RuntimeError(f"The {fixture_name} fixture page has no links to click.")
+                # The last link is the one nested deepest into a long page
+                x, y, width, height, uri = links[-1]
+                start_time = time.perf_counter()
+                clicked = web_driver_manager.click_at_pixel(x + width / 2, y + height / 2,
+                                                            navigation_timeout_seconds=main.WEBPAGE_LOAD_SECONDS)
+                durations.append(time.perf_counter() - start_time)
+                if not clicked:
+                    raise RuntimeError(f"Clicking a link of the {fixture_name} fixture page failed.")
+
+            results[f"click_at_pixel/{fixture_name}"] = summarize(durations)
+            print_result(f"click_at_pixel/{fixture_name}", results[f"click_at_pixel/{fixture_name}"])
+    finally:
+        web_driver_manager.quit()
+    return results
+
+
+def benchmark_documents(pdf_paths: Dict[str, str], iterations: int) -> Dict[str, dict]:
+    results = {}
+    rng = random.Random(0)
+    for fixture_name, pdf_path in pdf_paths.items():
+        results[f"document_load/{fixture_name}"] = summarize(time_iterations(lambda: Document(pdf_path), iterations))
+        print_result(f"document_load/{fixture_name}", results[f"document_load/{fixture_name}"])
+
+        document = Document(pdf_path)
+        queries = [(rng.random(), rng.random(), rng.randrange(len(document.pages))) for _ in range(CLICK_QUERY_COUNT)]
+
+        def run_queries():
+            for x, y, page_index in queries:
+                document.get_url_at_position(x, y, True, page_index)
+
+        results[f"get_url_at_position/{fixture_name}"] = summarize(time_iterations(run_queries, iterations), CLICK_QUERY_COUNT)
+        print_result(f"get_url_at_position/{fixture_name}", results[f"get_url_at_position/{fixture_name}"])
+
+        resonite_document = link_identifier.Document(pdf_path, pdf_path)
+
+        def encode_resonite_strings():
+            for _ in range(RESONITE_STRING_REPETITIONS):
+                resonite_document.get_resonite_string(include_request_data=True)
+
+        results[f"resonite_string/{fixture_name}"] = summarize(time_iterations(encode_resonite_strings, iterations),
+                                                               RESONITE_STRING_REPETITIONS)
+        print_result(f"resonite_string/{fixture_name}", results[f"resonite_string/{fixture_name}"])
+
+        def encode_link_maps():
+            for _ in range(RESONITE_STRING_REPETITIONS):
+                document.get_resonite_string(main.LINK_MAP_PRECISION if main.LINK_MAP_PRECISION >= 0 else None)
+
+        results[f"link_map/{fixture_name}"] = summarize(time_iterations(encode_link_maps, iterations),
+                                                        RESONITE_STRING_REPETITIONS)
+        print_result(f"link_map/{fixture_name}", results[f"link_map/{fixture_name}"])
+    return results
+
+
+def print_result(name: str, result: dict):
+    print(f"{name:<40} median {result['median_seconds'] * 1000:>10.3f} ms   "
+          f"p95 {result['p95_seconds'] * 1000:>10.3f} ms   "
+          f"per item {result['median_seconds_per_item'] * 1e6:>12.3f} us")
+
+
+def get_git_commit() -> Union[str, None]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, dict], previous_results_path: str, threshold: float) -> bool:
+    """
+    :param threshold: How many times slower than before a benchmark may get before it counts as a regression
+    :return: Whether any benchmark regressed
+    """
+    with open(previous_results_path) as f:
+        previous_results = json.load(f)["results"]
+
+    regressed = False
+    print(f"\nCompared to {previous_results_path}:")
+    for name, result in results.items():
+        previous_result = previous_results.get(name)
+        if not previous_result:
+            continue
+        ratio = result["median_seconds"] / previous_result["median_seconds"]
+        is_regression = ratio > threshold
+        regressed = regressed or is_regression
+        print(f"{name:<40} {ratio:>6.2f}x {'REGRESSION' if is_regression else ''}")
+    return regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument('--driver', choices=['fake', 'chrome'], default='fake',
+                        help="fake measures the Python overhead without a browser, chrome renders with a real browser.")
+    parser.add_argument('--readiness', choices=main.CdpEventMonitor.MODES, default=main.CdpEventMonitor.LOAD,
+                        help="Readiness mode used by the conversions.")
+    parser.add_argument('--quiet-seconds', type=float,
+                        help="Overrides READINESS_QUIET_SECONDS. 0 leaves only the converter's own overhead in the fake driver mode.")
+    parser.add_argument('--iterations', type=int, default=5, help="Times each benchmark runs.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="Compare the results with an earlier JSON file, and exit with 1 on a regression.")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="How many times slower than the earlier results counts as a regression.")
+    args = parser.parse_args()
+    if args.quiet_seconds is not None:
+        main.READINESS_QUIET_SECONDS = args.quiet_seconds
+
+    fixture_site = FixtureSite()
+    fixture_site.start()
+    try:
+        with tempfile.TemporaryDirectory() as storage_dir:
+            results, pdf_paths = benchmark_conversions(fixture_site, args.driver, args.readiness, args.iterations, storage_dir)
+            results.update(benchmark_image_captures(fixture_site, args.driver, args.readiness, args.iterations, storage_dir))
+            results.update(benchmark_clicks(fixture_site, args.driver, args.iterations))
+            results.update(benchmark_documents(pdf_paths, args.iterations))
+    finally:
+        fixture_site.stop()
+
+    report = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": get_git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "driver": args.driver,
+        "readiness": args.readiness,
+        "readiness_quiet_seconds": main.READINESS_QUIET_SECONDS,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"\nWrote results to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
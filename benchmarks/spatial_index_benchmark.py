@@ -0,0 +1,68 @@
+"""
+Compares hit-testing with a Page's spatial index against a linear scan over its links.
+
+Run from the root of this repo:
+python -m benchmarks.spatial_index_benchmark
+"""
+import random
+import time
+from typing import List, Union
+
+from LinkIdentification.Link import Link
+from LinkIdentification.Page import Page
+
+PAGE_WIDTH = 360.0
+PAGE_HEIGHT = 20000.0
+LINK_COUNTS = [10, 100, 500, 2000]
+QUERY_COUNT = 20000
+
+
+def build_page(link_count: int, rng: random.Random) -> Page:
+    page = Page(0, (PAGE_WIDTH, PAGE_HEIGHT))
+    for i in range(link_count):
+        # Mostly small, text-sized links, with the occasional large overlapping block
+        width = rng.uniform(20, PAGE_WIDTH) if rng.random() < 0.05 else rng.uniform(20, 120)
+        height = rng.uniform(100, 1000) if rng.random() < 0.05 else rng.uniform(10, 30)
+        x0 = rng.uniform(0, PAGE_WIDTH - width)
+        y0 = rng.uniform(0, PAGE_HEIGHT - height)
+        page.add_link(Link(f"https://example.com/{i}", (x0, y0, x0 + width, y0 + height), PAGE_WIDTH, PAGE_HEIGHT))
+    return page
+
+
+def linear_scan(page: Page, x: float, y: float) -> Union[Link, None]:
+    # The implementation Document.get_url_at_position used before the spatial index
+    for link in page.links:
+        if link.normalized_bounds[0] <= x <= link.normalized_bounds[2] and link.normalized_bounds[1] <= y <= link.normalized_bounds[3]:
+            return link
+    return None
+
+
+def time_queries(function, queries: List[tuple]) -> float:
+    start_time = time.perf_counter()
+    for x, y in queries:
+        function(x, y)
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    queries = [(rng.random(), rng.random()) for _ in range(QUERY_COUNT)]
+
+    print(f"{'links':>6} {'build (ms)':>11} {'scan (us/query)':>16} {'index (us/query)':>17} {'speedup':>8}")
+    for link_count in LINK_COUNTS:
+        page = build_page(link_count, rng)
+
+        build_start_time = time.perf_counter()
+        page.build_index()
+        build_seconds = time.perf_counter() - build_start_time
+
+        # Both implementations must resolve every query to the same link
+        for x, y in queries:
+            assert linear_scan(page, x, y) is page.get_link_at_position(x, y, normalized_coordinates=True)
+
+        scan_seconds = time_queries(lambda x, y: linear_scan(page, x, y), queries)
+        index_seconds = time_queries(lambda x, y: page.get_link_at_position(x, y, True), queries)
+
+        print(f"{link_count:>6} {build_seconds * 1000:>11.3f} "
+              f"{scan_seconds / QUERY_COUNT * 1e6:>16.3f} {index_seconds / QUERY_COUNT * 1e6:>17.3f} "
+              f"{scan_seconds / index_seconds:>7.1f}x")
@@ -69,30 +69,24 @@ class Document:
         LINK0_URI<LINK1_X_ORIGIN|LINK1_Y_ORIGIN|LINK1_WIDTH|LINK1_HEIGHT|LINK1_URI
         """
 
+        # Appending to a string in the loop copies everything written so far for every field,
+        # so the parts are collected and joined once instead
+        parts = []
         if include_request_data:
-            resonite_string = f"{self.url}"
-            resonite_string += f"*200*" # Add a dummy HTTP status code
-        else:
-            resonite_string = ""
+            parts.append(f"{self.url}")
+            parts.append(f"*200*") # Add a dummy HTTP status code
 
-        resonite_string += f"{len(self.pages)}"
+        parts.append(f"{len(self.pages)}")
 
         for page in self.pages:
             # The first two |-delimited values are the width and height of the page
-            resonite_string += f"|{page.size[0]}|{page.size[1]}|"
-            resonite_string += f"{len(page.links)}|"
+            parts.append(f"|{page.size[0]}|{page.size[1]}|")
+            parts.append(f"{len(page.links)}|")
             for link in page.links:
-                # Write link's x origin, delimited with a pipe
-                resonite_string += f"{link.origin[0]}|"
-                # Write link's y origin, delimited with a pipe
-                resonite_string += f"{link.origin[1]}|"
-                # Write link's width, delimited with a pipe
-                resonite_string += f"{link.bounds_width}|"
-                # Write link's height, delimited with a pipe
-                resonite_string += f"{link.bounds_height}|"
-                # Write link's URI
-                resonite_string += f"{link.uri}|"
+                # Write link's x origin, y origin, width and height, then its URI, each delimited with a pipe
+                parts.append(f"{link.origin[0]}|{link.origin[1]}|{link.bounds_width}|{link.bounds_height}|{link.uri}|")
 
+        resonite_string = "".join(parts)
         return resonite_string
 
     @staticmethod
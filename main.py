@@ -1,24 +1,44 @@
 import urllib
+import urllib.request
+import urllib.error
 
-from flask import Flask, request, send_from_directory, Response
+from flask import Flask, request, send_from_directory, Response, jsonify
 import time
 import base64
 import hashlib
+import json
 import os
 import logging
 import undetected_chromedriver as uc
+from undetected_chromedriver.patcher import Patcher
 import chromedriver_autoinstaller
 import configparser
-from selenium.webdriver.common.by import By
 import validators
+import queue
+import threading
+import argparse
+import signal
+import sys
+import multiprocessing
+import multiprocessing.connection
+import uuid
+import fitz  # PyMuPDF
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Union
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Union
 
 from werkzeug.sansio.multipart import SEARCH_EXTRA_LENGTH
 
+from LinkIdentification.Document import Document
 from LinkIdentification.DocumentCollection import DocumentCollection
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+import waitress
 from urllib.parse import urlparse
 from webdriver_manager.core.os_manager import OperationSystemManager, ChromeType
 
@@ -41,24 +61,745 @@ DUPLICATE_IMAGE_PRUNE_SECONDS = config.getint('DEFAULT', 'DUPLICATE_IMAGE_PRUNE_
 DUPLICATE_PDF_PRUNE_SECONDS = config.getint('DEFAULT', 'DUPLICATE_PDF_PRUNE_SECONDS')
 IMAGE_DEFAULT_WINDOW_WIDTH = config.getint('DEFAULT', 'IMAGE_DEFAULT_WINDOW_WIDTH')
 IMAGE_DEFAULT_WINDOW_HEIGHT = config.getint('DEFAULT', 'IMAGE_DEFAULT_WINDOW_HEIGHT')
+IMAGE_FORMAT = config.get('DEFAULT', 'IMAGE_FORMAT', fallback='png').lower()
+IMAGE_QUALITY = config.getint('DEFAULT', 'IMAGE_QUALITY', fallback=80)
+IMAGE_TILE_HEIGHT = config.getint('DEFAULT', 'IMAGE_TILE_HEIGHT', fallback=4096)
+IMAGE_MAX_HEIGHT = config.getint('DEFAULT', 'IMAGE_MAX_HEIGHT', fallback=32768)
 HEADLESS_WEBDRIVER = config.getboolean('DEFAULT', 'HEADLESS_WEBDRIVER')
 SEARCH_ENGINE = config.get('DEFAULT', 'SEARCH_ENGINE', fallback='google').lower()
+PDF_WEBDRIVER_POOL_SIZE = config.getint('DEFAULT', 'PDF_WEBDRIVER_POOL_SIZE', fallback=1)
+WEBDRIVER_LEASE_TIMEOUT_SECONDS = config.getint('DEFAULT', 'WEBDRIVER_LEASE_TIMEOUT_SECONDS', fallback=30)
+PDF_CACHE_MAX_AGE_SECONDS = config.getint('DEFAULT', 'PDF_CACHE_MAX_AGE_SECONDS', fallback=0)
+PDF_CACHE_REVALIDATE = config.getboolean('DEFAULT', 'PDF_CACHE_REVALIDATE', fallback=False)
+PDF_CACHE_REVALIDATE_TIMEOUT_SECONDS = config.getint('DEFAULT', 'PDF_CACHE_REVALIDATE_TIMEOUT_SECONDS', fallback=3)
+PDF_CACHE_ERROR_PAGES = config.getboolean('DEFAULT', 'PDF_CACHE_ERROR_PAGES', fallback=False)
+DOCUMENT_CACHE_MAX_ENTRIES = config.getint('DEFAULT', 'DOCUMENT_CACHE_MAX_ENTRIES', fallback=1000)
+DOCUMENT_CACHE_MAX_BYTES = config.getint('DEFAULT', 'DOCUMENT_CACHE_MAX_BYTES', fallback=268435456)
+STREAM_PDF_OUTPUT = config.getboolean('DEFAULT', 'STREAM_PDF_OUTPUT', fallback=False)
+PDF_STREAM_CHUNK_BYTES = config.getint('DEFAULT', 'PDF_STREAM_CHUNK_BYTES', fallback=1048576)
+RENDER_WORKER_PROCESSES = config.getint('DEFAULT', 'RENDER_WORKER_PROCESSES', fallback=1)
+WEBDRIVER_MAX_RENDERS = config.getint('DEFAULT', 'WEBDRIVER_MAX_RENDERS', fallback=0)
+WEBDRIVER_MAX_RSS_BYTES = config.getint('DEFAULT', 'WEBDRIVER_MAX_RSS_BYTES', fallback=0)
+WEBDRIVER_MAX_CONSECUTIVE_FAILURES = config.getint('DEFAULT', 'WEBDRIVER_MAX_CONSECUTIVE_FAILURES', fallback=3)
+WEBDRIVER_HEALTH_CHECK_INTERVAL_SECONDS = config.getint('DEFAULT', 'WEBDRIVER_HEALTH_CHECK_INTERVAL_SECONDS', fallback=30)
+WEBDRIVER_HEALTH_CHECK_TIMEOUT_SECONDS = config.getint('DEFAULT', 'WEBDRIVER_HEALTH_CHECK_TIMEOUT_SECONDS', fallback=5)
+WEBDRIVER_SPARE = config.getboolean('DEFAULT', 'WEBDRIVER_SPARE', fallback=True)
+WEBDRIVER_WARM_UP_IN_BACKGROUND = config.getboolean('DEFAULT', 'WEBDRIVER_WARM_UP_IN_BACKGROUND', fallback=True)
+BROWSER_DISCOVERY_CACHE_FILE = config.get('DEFAULT', 'BROWSER_DISCOVERY_CACHE_FILE', fallback='browser_discovery.json')
+WSGI_THREADS = config.getint('DEFAULT', 'WSGI_THREADS', fallback=16)
+BLOCKING_PROFILE = config.get('DEFAULT', 'BLOCKING_PROFILE', fallback='none').lower()
+READINESS_MODE = config.get('DEFAULT', 'READINESS_MODE', fallback='readystate').lower()
+READINESS_QUIET_SECONDS = config.getfloat('DEFAULT', 'READINESS_QUIET_SECONDS', fallback=0.5)
+READINESS_MAX_INFLIGHT_REQUESTS = config.getint('DEFAULT', 'READINESS_MAX_INFLIGHT_REQUESTS', fallback=0)
+JOB_QUEUE_MAX_SIZE = config.getint('DEFAULT', 'JOB_QUEUE_MAX_SIZE', fallback=100)
+# 0 uses one job worker per WebDriver, which depends on whether render worker processes are used
+JOB_WORKERS = config.getint('DEFAULT', 'JOB_WORKERS', fallback=0)
+JOB_RESULT_TTL_SECONDS = config.getint('DEFAULT', 'JOB_RESULT_TTL_SECONDS', fallback=3600)
+JOB_MAX_WAIT_SECONDS = config.getint('DEFAULT', 'JOB_MAX_WAIT_SECONDS', fallback=30)
+JOB_MIN_PRIORITY = config.getint('DEFAULT', 'JOB_MIN_PRIORITY', fallback=0)
+JOB_MAX_PRIORITY = config.getint('DEFAULT', 'JOB_MAX_PRIORITY', fallback=10)
+RETENTION_INTERVAL_SECONDS = config.getint('DEFAULT', 'RETENTION_INTERVAL_SECONDS', fallback=600)
+RETENTION_MAX_AGE_SECONDS = config.getint('DEFAULT', 'RETENTION_MAX_AGE_SECONDS', fallback=0)
+RETENTION_MAX_TOTAL_BYTES = config.getint('DEFAULT', 'RETENTION_MAX_TOTAL_BYTES', fallback=0)
+LINK_MAP_PRECISION = config.getint('DEFAULT', 'LINK_MAP_PRECISION', fallback=2)
+PAGE_IMAGE_PROCESSES = config.getint('DEFAULT', 'PAGE_IMAGE_PROCESSES', fallback=2)
+PAGE_IMAGE_MEMORY_CACHE_BYTES = config.getint('DEFAULT', 'PAGE_IMAGE_MEMORY_CACHE_BYTES', fallback=67108864)
+PAGE_IMAGE_DEFAULT_SCALE = config.getfloat('DEFAULT', 'PAGE_IMAGE_DEFAULT_SCALE', fallback=1.0)
+PAGE_IMAGE_MAX_SCALE = config.getfloat('DEFAULT', 'PAGE_IMAGE_MAX_SCALE', fallback=4.0)
+PDF_OPTIMIZE = config.getboolean('DEFAULT', 'PDF_OPTIMIZE', fallback=False)
+PDF_OPTIMIZE_PROCESSES = config.getint('DEFAULT', 'PDF_OPTIMIZE_PROCESSES', fallback=1)
+PDF_OPTIMIZE_IMAGE_DPI = config.getint('DEFAULT', 'PDF_OPTIMIZE_IMAGE_DPI', fallback=150)
+PDF_OPTIMIZE_IMAGE_QUALITY = config.getint('DEFAULT', 'PDF_OPTIMIZE_IMAGE_QUALITY', fallback=75)
+
+
+class Metric:
+    """
+    A metric in the Prometheus text exposition format, with one value per combination of label values.
+    """
+    TYPE = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: List[str] = None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names or []
+        self.lock = threading.Lock()
+        # A dict of label values, in the order of label_names, to the value for them
+        self.values: Dict[tuple, object] = {}
+
+    def get_label_values(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label_name, "")) for label_name in self.label_names)
+
+    @staticmethod
+    def format_labels(label_names: List[str], label_values: tuple) -> str:
+        if not label_names:
+            return ""
+        escaped_values = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in label_values)
+        return "{" + ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped_values)) + "}"
+
+    def render_samples(self) -> List[str]:
+        with self.lock:
+            return [f"{self.name}{self.format_labels(self.label_names, label_values)} {value}"
+                    for label_values, value in sorted(self.values.items())]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self.render_samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        label_values = self.get_label_values(labels)
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    TYPE = "gauge"
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.get_label_values(labels)] = value
+
+    def clear(self):
+        # For gauges set from a snapshot at scrape time, so label values that no longer exist disappear
+        with self.lock:
+            self.values.clear()
+
+
+class Histogram(Metric):
+    TYPE = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name: str, help_text: str, label_names: List[str] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        label_values = self.get_label_values(labels)
+        with self.lock:
+            # [count per bucket, sum, count]
+            histogram = self.values.get(label_values)
+            if histogram is None:
+                histogram = [[0] * len(self.buckets), 0.0, 0]
+                self.values[label_values] = histogram
+            for i, bucket in enumerate(self.buckets):
+                if value <= bucket:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render_samples(self) -> List[str]:
+        lines = []
+        bucket_label_names = self.label_names + ["le"]
+        with self.lock:
+            for label_values, (bucket_counts, total, count) in sorted(self.values.items()):
+                for bucket, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{self.name}_bucket{self.format_labels(bucket_label_names, label_values + (str(bucket),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{self.format_labels(bucket_label_names, label_values + ('+Inf',))} {count}")
+                labels = self.format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+METRICS = MetricsRegistry()
+CONVERSION_STAGE_SECONDS = METRICS.register(Histogram("conversion_stage_seconds",
+                                                      "Time spent in each stage of converting a webpage.",
+                                                      ["converter", "stage"]))
+CONVERSION_SECONDS = METRICS.register(Histogram("conversion_seconds",
+                                                "Total time to convert a webpage, including waiting for a WebDriver.",
+                                                ["converter", "outcome"]))
+RENDER_CACHE_LOOKUPS = METRICS.register(Counter("render_cache_lookups_total",
+                                                "Render cache lookups, by whether a cached render was reused.",
+                                                ["result"]))
+SHARED_RENDERS = METRICS.register(Counter("shared_renders_total",
+                                          "Requests that received the result of an identical render already in progress."))
+CLICK_LOOKUP_SECONDS = METRICS.register(Histogram("click_lookup_seconds",
+                                                  "Time to resolve click positions to URLs.",
+                                                  ["route"],
+                                                  buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)))
+LINK_MAP_REQUESTS = METRICS.register(Counter("link_map_requests_total",
+                                             "Link map requests, by whether the encoded link map was already cached.",
+                                             ["result"]))
+PAGE_IMAGE_LOOKUPS = METRICS.register(Counter("page_image_lookups_total",
+                                              "PDF page image requests, by whether the image came from memory, disk, or a new render.",
+                                              ["result"]))
+PAGE_IMAGE_RENDER_SECONDS = METRICS.register(Histogram("page_image_render_seconds",
+                                                       "Time to rasterize a PDF page, including waiting for a free process."))
+PDF_OPTIMIZATIONS = METRICS.register(Counter("pdf_optimizations_total",
+                                             "Background PDF optimizations, by whether they made the PDF smaller.",
+                                             ["result"]))
+PDF_OPTIMIZATION_BYTES = METRICS.register(Counter("pdf_optimization_bytes_total",
+                                                  "Sizes of optimized PDFs before and after optimizing them.",
+                                                  ["size"]))
+PDF_OPTIMIZATION_SECONDS = METRICS.register(Histogram("pdf_optimization_seconds",
+                                                      "Time to optimize a PDF, including waiting for a free process."))
+JOB_QUEUE_DEPTH = METRICS.register(Gauge("job_queue_depth", "Conversion jobs waiting for a worker."))
+WEBDRIVER_LEASES = METRICS.register(Gauge("webdriver_leases", "Times each WebDriver has been leased.", ["process", "driver"]))
+WEBDRIVER_BUSY_SECONDS = METRICS.register(Gauge("webdriver_busy_seconds", "Time each WebDriver has spent leased.", ["process", "driver"]))
+WEBDRIVER_BUSY = METRICS.register(Gauge("webdriver_busy", "Whether each WebDriver is currently leased.", ["process", "driver"]))
+WEBDRIVER_RECYCLES = METRICS.register(Gauge("webdriver_recycles", "Times each WebDriver slot has been recycled.", ["process", "driver"]))
+DOCUMENT_CACHE_HITS = METRICS.register(Gauge("document_cache_hits", "Parsed PDF lookups served from memory."))
+DOCUMENT_CACHE_MISSES = METRICS.register(Gauge("document_cache_misses", "Parsed PDF lookups that had to load the PDF."))
+DOCUMENT_CACHE_DOCUMENTS = METRICS.register(Gauge("document_cache_documents", "Parsed PDFs held in memory."))
+DOCUMENT_CACHE_BYTES = METRICS.register(Gauge("document_cache_bytes", "Approximate memory used by parsed PDFs."))
+PAGE_IMAGE_CACHE_IMAGES = METRICS.register(Gauge("page_image_cache_images", "Rendered PDF page images held in memory."))
+PAGE_IMAGE_CACHE_BYTES = METRICS.register(Gauge("page_image_cache_bytes", "Memory used by rendered PDF page images."))
+
+
+class StageTimer:
+    """
+    Accumulates how long each stage of a conversion takes.
+    Stages that run more than once, like reading a streamed PDF in chunks, add up.
+    """
+    def __init__(self):
+        self.stage_seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time)
+
+    def add(self, name: str, seconds: float):
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+
+
+class BlockingProfile:
+    """
+    A named set of URL patterns that Chrome refuses to load while rendering, e.g. ads, trackers and web fonts.
+    Resource types are blocked through the file extensions they are usually served with.
+    """
+    RESOURCE_TYPE_EXTENSIONS = {
+        'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+        'media': ['mp4', 'webm', 'ogg', 'ogv', 'mp3', 'm4a', 'm4s', 'm3u8', 'mpd', 'mov'],
+        'image': ['png', 'jpg', 'jpeg', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'],
+        'stylesheet': ['css'],
+        'script': ['js', 'mjs'],
+    }
+
+    def __init__(self, name: str, url_patterns: List[str], resource_types: List[str]):
+        self.name = name
+        self.resource_types = resource_types
+        self.url_patterns = list(url_patterns)
+        for resource_type in resource_types:
+            if resource_type not in BlockingProfile.RESOURCE_TYPE_EXTENSIONS:
+                raise ValueError(f"Unsupported resource type '{resource_type}' in blocking profile '{name}'. "
+                                 f"Expected one of {list(BlockingProfile.RESOURCE_TYPE_EXTENSIONS)}")
+            for extension in BlockingProfile.RESOURCE_TYPE_EXTENSIONS[resource_type]:
+                # With and without a query string
+                self.url_patterns.append(f"*.{extension}")
+                self.url_patterns.append(f"*.{extension}?*")
+
+        self.stats_lock = threading.Lock()
+        self.renders = 0
+        self.blocked_requests = 0
+        self.transferred_requests = 0
+        self.transferred_bytes = 0
+        # A dict of CDP resource type, e.g. "Font", to the number of blocked requests of that type
+        self.blocked_requests_by_type: Dict[str, int] = {}
+
+    def record_render(self, blocked_requests_by_type: Dict[str, int], transferred_requests: int, transferred_bytes: int):
+        with self.stats_lock:
+            self.renders += 1
+            self.transferred_requests += transferred_requests
+            self.transferred_bytes += transferred_bytes
+            for resource_type, count in blocked_requests_by_type.items():
+                self.blocked_requests += count
+                self.blocked_requests_by_type[resource_type] = self.blocked_requests_by_type.get(resource_type, 0) + count
+
+    def get_stats(self) -> dict:
+        with self.stats_lock:
+            return {
+                "renders": self.renders,
+                "url_patterns": len(self.url_patterns),
+                "blocked_requests": self.blocked_requests,
+                "blocked_requests_by_type": dict(self.blocked_requests_by_type),
+                # Blocked requests are never downloaded, so their size is unknown.
+                # Compare transferred bytes per render against the "none" profile to see what a profile saves.
+                "transferred_requests": self.transferred_requests,
+                "transferred_bytes": self.transferred_bytes,
+            }
+
+    def __repr__(self):
+        return f"BlockingProfile(name={self.name}, url_patterns={len(self.url_patterns)})"
+
+
+def load_blocking_profiles(config: configparser.ConfigParser) -> Dict[str, BlockingProfile]:
+    """
+    Blocking profiles are configured in sections named [blocking_profile.<name>], with comma-separated
+    URL_PATTERNS (wildcards allowed) and RESOURCE_TYPES. The "none" profile never blocks anything.
+    """
+    blocking_profiles = {'none': BlockingProfile('none', url_patterns=[], resource_types=[])}
+    for section in config.sections():
+        if not section.startswith('blocking_profile.'):
+            continue
+        name = section[len('blocking_profile.'):].lower()
+        url_patterns = [pattern.strip() for pattern in config.get(section, 'URL_PATTERNS', fallback='').split(',') if pattern.strip()]
+        resource_types = [resource_type.strip().lower() for resource_type in config.get(section, 'RESOURCE_TYPES', fallback='').split(',') if resource_type.strip()]
+        blocking_profiles[name] = BlockingProfile(name, url_patterns=url_patterns, resource_types=resource_types)
+    return blocking_profiles
+
+
+BLOCKING_PROFILES = load_blocking_profiles(config)
+
+
+class NavigationRecord:
+    """
+    The outcome of the main-frame navigation, as observed from CDP network events.
+    """
+    def __init__(self):
+        self.status_code: Union[int, None] = None
+        self.final_url: Union[str, None] = None
+        # (url, status_code) of each document that redirected, in order
+        self.redirect_chain: List[Tuple[str, int]] = []
+        # Response headers of the final document, with lowercase names
+        self.headers: Dict[str, str] = {}
+
+    def __repr__(self):
+        return f"NavigationRecord(status_code={self.status_code}, final_url={self.final_url}, redirect_chain={self.redirect_chain})"
+
+
+class CdpEventMonitor:
+    """
+    Tracks page lifecycle and network activity from the CDP events that ChromeDriver records in the performance log,
+    so page readiness can be detected without polling the page with scripts.
+    It also records the HTTP status and redirect chain of each navigation, so the page doesn't need to be fetched again.
+    """
+    # Readiness modes
+    READYSTATE = "readystate"  # Poll document.readyState, the original behavior
+    LOAD = "load"  # Wait for the load event of the final page in the redirect chain
+    NETWORK_IDLE = "networkidle"  # Like LOAD, then wait until the network has been quiet for a while
+    MODES = [READYSTATE, LOAD, NETWORK_IDLE]
+
+    POLL_INTERVAL_SECONDS = 0.05
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.main_frame_id = None
+        self.navigation_count = 0
+        self.last_navigation_time = 0.0
+        self.load_fired = False
+        self.inflight_request_ids = set()
+        self.last_network_activity_time = 0.0
+        self.navigation = NavigationRecord()
+        # Request ID of the main-frame document request currently being tracked
+        self.navigation_request_id = None
+        # A dict of request ID to CDP resource type, to attribute blocked requests
+        self.request_types: Dict[str, str] = {}
+        self.blocked_requests_by_type: Dict[str, int] = {}
+        self.transferred_requests = 0
+        self.transferred_bytes = 0
+
+        self.driver.execute_cdp_cmd('Page.enable', {})
+        self.driver.execute_cdp_cmd('Network.enable', {})
+        self.driver.execute_cdp_cmd('Page.setLifecycleEventsEnabled', {'enabled': True})
+        # The main frame keeps its ID across navigations within the tab
+        self.main_frame_id = self.driver.execute_cdp_cmd('Page.getFrameTree', {})['frameTree']['frame']['id']
+
+    def reset(self):
+        """
+        Discard the events recorded so far. Call this right before navigating.
+        """
+        self.driver.get_log('performance')
+        self.navigation_count = 0
+        self.last_navigation_time = time.time()
+        self.load_fired = False
+        self.inflight_request_ids.clear()
+        self.last_network_activity_time = time.time()
+        self.navigation = NavigationRecord()
+        self.navigation_request_id = None
+        self.request_types.clear()
+        self.blocked_requests_by_type = {}
+        self.transferred_requests = 0
+        self.transferred_bytes = 0
+
+    def get_navigation(self) -> NavigationRecord:
+        """
+        :return: What is known so far about the navigation since the last reset
+        """
+        self.poll()
+        return self.navigation
+
+    def poll(self):
+        for entry in self.driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            # Log timestamps are wall-clock milliseconds of when ChromeDriver received the event.
+            # driver.get blocks until the page loads, so these can be well before the poll.
+            event_time = entry.get('timestamp', time.time() * 1000) / 1000
+            self.handle_event(message.get('method'), message.get('params', {}), event_time)
+
+    def handle_event(self, method: str, params: dict, now: float):
+        if method == 'Page.frameStartedLoading':
+            if self.main_frame_id is None or params.get('frameId') == self.main_frame_id:
+                # A new document is loading in the main frame, e.g. because of a redirect
+                self.load_fired = False
+                self.last_navigation_time = now
+        elif method == 'Page.frameNavigated':
+            frame = params.get('frame', {})
+            if not frame.get('parentId'):
+                self.main_frame_id = frame.get('id')
+                self.navigation_count += 1
+                self.load_fired = False
+                self.last_navigation_time = now
+                # Requests of the previous document will never finish
+                self.inflight_request_ids.clear()
+        elif method == 'Page.loadEventFired':
+            self.load_fired = True
+        elif method == 'Page.lifecycleEvent':
+            if params.get('name') == 'load' and params.get('frameId') == self.main_frame_id:
+                self.load_fired = True
+        elif method == 'Network.requestWillBeSent':
+            self.inflight_request_ids.add(params.get('requestId'))
+            self.request_types[params.get('requestId')] = params.get('type', 'Other')
+            self.last_network_activity_time = now
+            if params.get('type') == 'Document' and params.get('frameId') == self.main_frame_id:
+                self.handle_navigation_request(params)
+        elif method == 'Network.responseReceived':
+            if params.get('requestId') == self.navigation_request_id:
+                response = params.get('response', {})
+                self.navigation.status_code = response.get('status')
+                self.navigation.final_url = response.get('url')
+                self.navigation.headers = {name.lower(): value for name, value in response.get('headers', {}).items()}
+        elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+            self.inflight_request_ids.discard(params.get('requestId'))
+            self.last_network_activity_time = now
+            resource_type = self.request_types.pop(params.get('requestId'), None) or params.get('type', 'Other')
+            if method == 'Network.loadingFinished':
+                self.transferred_requests += 1
+                self.transferred_bytes += int(params.get('encodedDataLength', 0))
+            elif params.get('blockedReason'):
+                self.blocked_requests_by_type[resource_type] = self.blocked_requests_by_type.get(resource_type, 0) + 1
+        elif method == 'Network.dataReceived':
+            self.last_network_activity_time = now
+
+    def handle_navigation_request(self, params: dict):
+        redirect_response = params.get('redirectResponse')
+        if redirect_response:
+            # An HTTP redirect continues the same request
+            self.navigation.redirect_chain.append((redirect_response.get('url'), redirect_response.get('status')))
+        elif self.navigation.status_code is not None:
+            # A new document request after a response means a client-side redirect, e.g. from a script or meta refresh
+            self.navigation.redirect_chain.append((self.navigation.final_url, self.navigation.status_code))
+        self.navigation_request_id = params.get('requestId')
+        self.navigation.status_code = None
+        self.navigation.final_url = params.get('request', {}).get('url')
+        self.navigation.headers = {}
+
+    def is_ready(self, mode: str, quiet_seconds: float, max_inflight_requests: int, now: float) -> bool:
+        # The page is not ready until the last document in the redirect chain has loaded,
+        # and no new navigation has started for the quiet window
+        if not self.load_fired or now - self.last_navigation_time < quiet_seconds:
+            return False
+        if mode == CdpEventMonitor.NETWORK_IDLE:
+            return (len(self.inflight_request_ids) <= max_inflight_requests
+                    and now - self.last_network_activity_time >= quiet_seconds)
+        return True
+
+    def wait_for_navigation(self, timeout_seconds: float) -> bool:
+        """
+        Wait for a new document to start loading in the main frame, e.g. after a click.
+        Call reset before the action that may navigate.
+        :return: Whether a navigation started within the timeout
+        """
+        start_time = time.time()
+        while True:
+            self.poll()
+            if self.navigation_request_id is not None or self.navigation_count > 0:
+                return True
+            if time.time() - start_time >= timeout_seconds:
+                return False
+            time.sleep(CdpEventMonitor.POLL_INTERVAL_SECONDS)
+
+    def wait_until_ready(self, mode: str, timeout_seconds: float, quiet_seconds: float, max_inflight_requests: int) -> bool:
+        start_time = time.time()
+        while True:
+            self.poll()
+            now = time.time()
+            if self.is_ready(mode, quiet_seconds, max_inflight_requests, now):
+                logging.info(f"Confirmed webpage is ready in {round(now - start_time, 4)} seconds based on CDP events "
+                             f"(mode={mode}, navigations={self.navigation_count}, inflight requests={len(self.inflight_request_ids)}).")
+                return True
+            if now - start_time >= timeout_seconds:
+                return False
+            time.sleep(CdpEventMonitor.POLL_INTERVAL_SECONDS)
+
+
+class RenderOptions:
+    """
+    Per-request choices about how a webpage is rendered.
+    """
+    # Image formats Page.captureScreenshot can encode, and the file extension of each
+    IMAGE_FORMATS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+
+    def __init__(self, readiness_mode: str = READINESS_MODE, blocking_profile: str = BLOCKING_PROFILE,
+                 image_format: str = IMAGE_FORMAT, image_quality: int = IMAGE_QUALITY):
+        """
+        :param image_quality: Compression quality from 0 to 100 of jpeg and webp images. Ignored for png.
+        """
+        if readiness_mode not in CdpEventMonitor.MODES:
+            raise ValueError(f"Unsupported readiness mode: {readiness_mode}. Expected one of {CdpEventMonitor.MODES}")
+        if blocking_profile not in BLOCKING_PROFILES:
+            raise ValueError(f"Unknown blocking profile: {blocking_profile}. Expected one of {list(BLOCKING_PROFILES)}")
+        if image_format not in RenderOptions.IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}. Expected one of {list(RenderOptions.IMAGE_FORMATS)}")
+        if not 0 <= image_quality <= 100:
+            raise ValueError(f"Image quality must be from 0 to 100, not {image_quality}.")
+        self.readiness_mode = readiness_mode
+        self.blocking_profile = BLOCKING_PROFILES[blocking_profile]
+        self.image_format = image_format
+        self.image_quality = image_quality
+
+    def get_cache_key(self, url: str) -> str:
+        """
+        :return: Key identifying renders of the URL with these options. Renders without blocking use the URL itself,
+        so their filenames keep matching the URL's hash.
+        """
+        if self.blocking_profile.name == 'none':
+            return url
+        return f"{self.blocking_profile.name}|{url}"
+
+    def get_image_cache_key(self, url: str) -> str:
+        """
+        :return: Like get_cache_key, but also identifying the format and quality of image captures
+        """
+        if self.image_format == 'png':
+            return f"{self.image_format}|{self.get_cache_key(url)}"
+        return f"{self.image_format}|{self.image_quality}|{self.get_cache_key(url)}"
+
+    def __repr__(self):
+        return (f"RenderOptions(readiness_mode={self.readiness_mode}, blocking_profile={self.blocking_profile.name}, "
+                f"image_format={self.image_format}, image_quality={self.image_quality})")
+
+
+class BrowserDiscovery:
+    """
+    Finds the installed browser's version and a matching, patched chromedriver, and caches both in a JSON file.
+    The cache is reused as long as the browser executable and the chromedriver binary are unchanged on disk,
+    which takes a few stat() calls instead of running the browser and checking for chromedriver downloads.
+    """
+    SNAP_CHROMIUM_CURRENT = '/snap/chromium/current'
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.result: Union[dict, None] = None
+
+    @staticmethod
+    def get_file_signature(path: str) -> Union[List[float], None]:
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        return [stat.st_mtime, stat.st_size]
+
+    @staticmethod
+    def get_browser_signature(browser_path: str) -> Union[list, None]:
+        signature = BrowserDiscovery.get_file_signature(browser_path)
+        # Snap launches the browser through a wrapper that doesn't change when the snap is refreshed,
+        # so the installed revision is compared as well
+        if signature and os.path.islink(BrowserDiscovery.SNAP_CHROMIUM_CURRENT):
+            signature.append(os.readlink(BrowserDiscovery.SNAP_CHROMIUM_CURRENT))
+        return signature
+
+    def discover(self) -> dict:
+        """
+        :return: A dict with browser_path, browser_version, version_main and chromedriver_path
+        """
+        with self.lock:
+            if self.result is None:
+                result = self.load()
+                if result:
+                    logging.info(f"Using cached browser discovery: Chrome {result['browser_version']} at {result['browser_path']}.")
+                else:
+                    result = self.run_discovery()
+                    self.save(result)
+                self.result = result
+
+                # What chromedriver_autoinstaller.install() does after installing
+                chromedriver_dir = os.path.dirname(result['chromedriver_path'])
+                if chromedriver_dir not in os.environ.get('PATH', '').split(os.pathsep):
+                    os.environ['PATH'] = chromedriver_dir + os.pathsep + os.environ.get('PATH', '')
+            return self.result
+
+    def load(self) -> Union[dict, None]:
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        browser_path = uc.find_chrome_executable()
+        if browser_path:
+            browser_path = os.path.realpath(browser_path)
+        if (browser_path != cached.get('browser_path')
+                or self.get_browser_signature(browser_path) != cached.get('browser_signature')
+                or self.get_file_signature(cached.get('chromedriver_path')) != cached.get('chromedriver_signature')):
+            logging.info("The browser or chromedriver changed since the last discovery. Discovering them again.")
+            return None
+        return cached
+
+    def run_discovery(self) -> dict:
+        logging.info("Discovering the browser version and installing a matching chromedriver.")
+        browser_path = os.path.realpath(uc.find_chrome_executable())
+        browser_version = OperationSystemManager().get_browser_version_from_os(ChromeType.CHROMIUM)
+        chromedriver_path = chromedriver_autoinstaller.install()
+
+        # Patch the driver once here; every WebDriverManager then reuses it instead of downloading and patching its own,
+        # which also keeps drivers that start in parallel from overwriting each other's binary
+        Patcher(executable_path=chromedriver_path).auto()
+
+        return {
+            'browser_path': browser_path,
+            'browser_signature': self.get_browser_signature(browser_path),
+            'browser_version': browser_version,
+            'version_main': int(browser_version.split('.')[0]),
+            'chromedriver_path': chromedriver_path,
+            'chromedriver_signature': self.get_file_signature(chromedriver_path),
+        }
+
+    def save(self, result: dict):
+        try:
+            with open(self.cache_path, 'w') as f:
+                json.dump(result, f, indent=4)
+        except OSError as e:
+            logging.warning(f"Could not write the browser discovery cache to {self.cache_path}: {e}")
+
+
+BROWSER_DISCOVERY = BrowserDiscovery(BROWSER_DISCOVERY_CACHE_FILE)
 
 
 class WebDriverManager:
+    # Emulated screen of every driver, which the PDF layout is based on. Image captures override it while they run.
+    DEVICE_METRICS_OVERRIDE = {
+        "width": 360,
+        "height": 800,
+        "deviceScaleFactor": 50,
+        "mobile": True
+    }
+
+    # Finds the element at a page position, walks up to its nearest clickable ancestor and clicks it.
+    # An element is clickable if it is a link or button, has an onclick attribute, or has the button role.
+    CLICK_AT_PIXEL_SCRIPT = """
+        const [x, y] = arguments;
+        // Scroll the position to the middle of the window, so it can be hit-tested
+        window.scrollTo(0, y - window.innerHeight / 2);
+        let element = document.elementFromPoint(x - window.scrollX, y - window.scrollY);
+        const found = element !== null;
+        for (; element; element = element.parentElement) {
+            const tag = element.tagName.toLowerCase();
+            if (tag === 'a' || tag === 'button' || element.hasAttribute('onclick') || element.getAttribute('role') === 'button') {
+                const href = tag === 'a' && element.hasAttribute('href') ? element.href : null;
+                element.click();
+                return {clicked: true, found: found, tag: tag, href: href};
+            }
+        }
+        return {clicked: false, found: found, tag: null, href: null};
+    """
+
     def __init__(self, webpage_timeout_seconds: int):
         self.driver = None
+        self.cdp_event_monitor: Union[CdpEventMonitor, None] = None
+        self.blocking_profile: Union[BlockingProfile, None] = None
+        self.start_time = time.time()
+        self.render_count = 0
+        self.consecutive_failures = 0
         self.setup_undetected_chrome_driver(webpage_timeout_seconds)
 
-    def setup_undetected_chrome_driver(self, webpage_timeout_seconds: int):
-        chromedriver_autoinstaller.install()
+    def record_render(self, succeeded: bool):
+        self.render_count += 1
+        self.consecutive_failures = 0 if succeeded else self.consecutive_failures + 1
 
-        set_device_metrics_override = dict({
-            "width": 360,
-            "height": 800,
-            "deviceScaleFactor": 50,
-            "mobile": True
-        })
+    def is_healthy(self, timeout_seconds: float) -> bool:
+        """
+        Check that the browser still answers a trivial script.
+        A hung renderer blocks the WebDriver call itself, so the check runs on its own thread and gives up after timeout_seconds.
+        """
+        result = {}
+
+        def check():
+            try:
+                result['value'] = self.driver.execute_script("return 1;")
+            except Exception as e:
+                result['error'] = e
+
+        check_thread = threading.Thread(target=check, name="WebDriverHealthCheck", daemon=True)
+        check_thread.start()
+        check_thread.join(timeout_seconds)
+        if check_thread.is_alive():
+            logging.warning(f"WebDriver did not answer a health check within {timeout_seconds} seconds.")
+            return False
+        if 'error' in result:
+            logging.warning(f"WebDriver failed a health check: {result['error']}")
+            return False
+        return result.get('value') == 1
+
+    def get_rss_bytes(self) -> Union[int, None]:
+        """
+        :return: The resident memory of the browser and all of its child processes, or None if it can't be read (e.g. not on Linux)
+        """
+        browser_pid = getattr(self.driver, 'browser_pid', None)
+        if not browser_pid or not os.path.isdir('/proc'):
+            return None
+
+        # A dict of parent pid to child pids, built from /proc/<pid>/stat
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces, so the fields are read after its closing parenthesis
+                    parent_pid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent_pid, []).append(int(entry))
+
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        rss_bytes = 0
+        pids = [browser_pid]
+        while pids:
+            pid = pids.pop()
+            try:
+                with open(f'/proc/{pid}/statm') as f:
+                    rss_bytes += int(f.read().split()[1]) * page_size
+            except (OSError, IndexError, ValueError):
+                continue
+            pids.extend(children.get(pid, []))
+        return rss_bytes
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logging.warning(f"Error quitting WebDriver: {e}")
+
+    def apply_blocking_profile(self, blocking_profile: BlockingProfile):
+        if blocking_profile is self.blocking_profile:
+            return
+        self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocking_profile.url_patterns})
+        self.blocking_profile = blocking_profile
+        logging.info(f"Applied blocking profile '{blocking_profile.name}' with {len(blocking_profile.url_patterns)} URL patterns.")
+
+    def setup_undetected_chrome_driver(self, webpage_timeout_seconds: int):
+        browser = BROWSER_DISCOVERY.discover()
 
         options = uc.ChromeOptions()
 
@@ -73,89 +814,983 @@ class WebDriverManager:
             "profile.default_content_setting_values.geolocation": 2,  # 1: allow, 2: block
         })
 
+        # Record Network and Page CDP events, which CdpEventMonitor reads to detect page readiness
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
         if HEADLESS_WEBDRIVER:
             logging.info("Running WebDriver in headless mode. Note: some websites may detect this and block access.")
             options.add_argument('--headless')
         else:
             logging.info("Running WebDriver in non-headless mode.")
 
-        br_ver = OperationSystemManager().get_browser_version_from_os(ChromeType.CHROMIUM)
-        version_main = int(br_ver.split('.')[0])
-
-        self.driver = uc.Chrome(options=options, version_main=version_main)
-        self.driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', set_device_metrics_override)
+        self.driver = uc.Chrome(options=options, version_main=browser['version_main'],
+                                driver_executable_path=browser['chromedriver_path'],
+                                browser_executable_path=browser['browser_path'])
+        self.driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', WebDriverManager.DEVICE_METRICS_OVERRIDE)
         self.driver.set_page_load_timeout(webpage_timeout_seconds)
         self.driver.minimize_window()
+        self.cdp_event_monitor = CdpEventMonitor(self.driver)
 
 
-    def click_at_pixel(self, x, y) -> bool:
-        # Scroll the window to the y-coordinate minus half the window height to ensure the element is in the view
+    def click_at_pixel(self, x: float, y: float, navigation_timeout_seconds: float = 0) -> bool:
+        """
+        Click the clickable element at a position, in one script call regardless of how deeply the element is nested.
+        :param x: Horizontal position in CSS pixels from the left of the page
+        :param y: Vertical position in CSS pixels from the top of the page
+        :param navigation_timeout_seconds: If greater than 0, wait up to this long for a navigation caused by the click
+        to load, using the CDP events of the page
+        :return: Whether an element was clicked
+        """
         logging.info(f"Clicking at x={x}, y={y}")
-        self.driver.execute_script("window.scrollTo(0, arguments[0] - window.innerHeight / 2);", y)
-        time.sleep(0.1)  # Allow time for dynamic content
-
-        # Retrieve the element at the given x, y coordinates
-        element = self.driver.execute_script("return document.elementFromPoint(arguments[0], arguments[1]);", x, y)
-        if element:
-            # Check if the element itself or any of its parents are clickable
-            clickable_element = self.get_clickable_element(element)
-            if clickable_element:
-                # Check if the element is likely to cause a URL change
-                if clickable_element.tag_name.lower() == 'a' and clickable_element.get_attribute('href'):
-                    logging.info("Element will change the URL. Adjusting window size.")
-                    self.driver.set_window_size(IMAGE_DEFAULT_WINDOW_WIDTH, IMAGE_DEFAULT_WINDOW_HEIGHT)
-                # Execute a click directly via JavaScript
-                self.driver.execute_script("arguments[0].click();", clickable_element)
-                return True
+        wait_for_navigation = navigation_timeout_seconds > 0 and self.cdp_event_monitor is not None
+        if wait_for_navigation:
+            self.cdp_event_monitor.reset()
+
+        # The pooled driver may have been left at another window size, which would move the position, and the page
+        # the click opens is laid out at this size
+        self.driver.set_window_size(IMAGE_DEFAULT_WINDOW_WIDTH, IMAGE_DEFAULT_WINDOW_HEIGHT)
+        result = self.driver.execute_script(WebDriverManager.CLICK_AT_PIXEL_SCRIPT, x, y)
+        if not result['clicked']:
+            if result['found']:
+                logging.info("Element or its parents are not clickable.")
             else:
-                print("Element or its parents are not clickable.")
-                return False
-        else:
-            print("No element found at these coordinates.")
+                logging.info("No element found at these coordinates.")
             return False
+        logging.info(f"Clicked <{result['tag']}>{' linking to ' + result['href'] if result['href'] else ''}.")
+
+        if wait_for_navigation:
+            start_time = time.time()
+            if self.cdp_event_monitor.wait_for_navigation(navigation_timeout_seconds):
+                remaining_seconds = max(0.0, navigation_timeout_seconds - (time.time() - start_time))
+                if not self.cdp_event_monitor.wait_until_ready(mode=CdpEventMonitor.LOAD,
+                                                               timeout_seconds=remaining_seconds,
+                                                               quiet_seconds=READINESS_QUIET_SECONDS,
+                                                               max_inflight_requests=READINESS_MAX_INFLIGHT_REQUESTS):
+                    logging.warning(f"The navigation caused by the click did not load within {navigation_timeout_seconds} seconds.")
+            else:
+                logging.info("The click did not cause a navigation.")
+        return True
+
+
+class WebDriverPoolExhausted(Exception):
+    pass
+
+
+class WebDriverPool:
+    """
+    A fixed-size pool of WebDriverManager instances.
+    A driver is leased by exactly one thread at a time, so concurrent requests never share a browser.
+    A watchdog recycles drivers that fail health checks, have rendered max_renders pages, use more than max_rss_bytes
+    of memory, or failed max_consecutive_failures renders in a row. When a spare is enabled, a pre-warmed driver takes
+    the recycled driver's place right away, and the old browser is shut down and a new spare started in the background.
+    Otherwise the replacement starts in the background, and the old driver keeps serving until it is ready.
+    """
+    def __init__(self, size: int, webpage_timeout_seconds: int, lease_timeout_seconds: int,
+                 max_renders: int = 0, max_rss_bytes: int = 0, max_consecutive_failures: int = 0,
+                 health_check_interval_seconds: int = 0, health_check_timeout_seconds: int = 5, spare: bool = False,
+                 warm_up_in_background: bool = False):
+        """
+        :param max_renders: Renders after which a driver is recycled. 0 disables the limit.
+        :param max_rss_bytes: Browser memory above which a driver is recycled. 0 disables the limit.
+        :param max_consecutive_failures: Failed renders in a row after which a driver is recycled. 0 disables the limit.
+        :param health_check_interval_seconds: How often idle drivers are health-checked. 0 disables the watchdog thread.
+        :param spare: Whether to keep a pre-warmed driver ready to replace a recycled one
+        :param warm_up_in_background: Whether to return right away and start the drivers on a background thread
+        """
+        self.size = max(1, size)
+        self.webpage_timeout_seconds = webpage_timeout_seconds
+        self.lease_timeout_seconds = lease_timeout_seconds
+        self.max_renders = max_renders
+        self.max_rss_bytes = max_rss_bytes
+        self.max_consecutive_failures = max_consecutive_failures
+        self.health_check_interval_seconds = health_check_interval_seconds
+        self.health_check_timeout_seconds = health_check_timeout_seconds
+        # Slots are None until their driver has started
+        self.web_driver_managers: List[Union[WebDriverManager, None]] = [None] * self.size
+        self.available_web_driver_managers: "queue.Queue[WebDriverManager]" = queue.Queue()
+        self.stats_lock = threading.Lock()
+        # A dict of WebDriverManager id to its stats
+        self.stats: Dict[int, dict] = {}
+        self.spare_lock = threading.Lock()
+        self.spare_web_driver_manager: Union[WebDriverManager, None] = None
+        self.spare_starting = False
+        self.spare_enabled = spare
+        self.recycles = 0
+        self.stop_event = threading.Event()
+
+        self.warm_up_failures = 0
+        self.warm_up_done = threading.Event()
+
+        if warm_up_in_background:
+            # Leases wait for the first driver to become available, so callers don't need to wait for the warm-up
+            threading.Thread(target=self.warm_up, name="WebDriverWarmUp", daemon=True).start()
+        else:
+            self.warm_up()
+
+    def warm_up(self):
+        # Chrome startup is mostly waiting on the browser process, so all drivers start in parallel
+        warm_up_start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="WebDriverWarmUp") as executor:
+            list(executor.map(self.start_driver, range(self.size)))
+        logging.info(f"Warmed up {self.get_ready_count()} of {self.size} WebDrivers in {time.time() - warm_up_start_time:.1f} seconds.")
+        self.warm_up_done.set()
+
+        if self.spare_enabled:
+            self.start_spare()
+        if self.health_check_interval_seconds > 0:
+            threading.Thread(target=self._watch, name="WebDriverWatchdog", daemon=True).start()
+
+    def start_driver(self, index: int):
+        logging.info(f"Starting WebDriver {index + 1} of {self.size} for the pool.")
+        try:
+            web_driver_manager = WebDriverManager(webpage_timeout_seconds=self.webpage_timeout_seconds)
+        except Exception as e:
+            # The watchdog retries empty slots
+            logging.error(f"Could not start WebDriver {index + 1} of {self.size}: {e}")
+            with self.stats_lock:
+                self.warm_up_failures += 1
+            return
+
+        with self.stats_lock:
+            self.web_driver_managers[index] = web_driver_manager
+            self.stats[id(web_driver_manager)] = {
+                "index": index,
+                "leases": 0,
+                "failures": 0,
+                "busy": False,
+                "busy_seconds": 0.0,
+                "last_lease_time": None,
+                "recycles": 0,
+                "last_recycle_reason": None,
+            }
+        self.available_web_driver_managers.put(web_driver_manager)
+
+    def get_ready_count(self) -> int:
+        with self.stats_lock:
+            return sum(1 for web_driver_manager in self.web_driver_managers if web_driver_manager is not None)
+
+    def get_warm_up_state(self) -> dict:
+        ready_count = self.get_ready_count()
+        if not self.warm_up_done.is_set():
+            state = "warming_up"
+        elif ready_count == 0:
+            state = "failed"
+        else:
+            state = "ready"
+        with self.stats_lock:
+            failures = self.warm_up_failures
+        return {"state": state, "ready": ready_count, "size": self.size, "failures": failures}
+
+    @contextmanager
+    def lease(self, timeout_seconds: float = None):
+        """
+        Lease a WebDriverManager from the pool, and return it once the caller is done with it.
+        :param timeout_seconds: How long to wait for a free driver. Defaults to the pool's lease timeout.
+        :raises WebDriverPoolExhausted: If no driver became available within the timeout.
+        """
+        if timeout_seconds is None:
+            timeout_seconds = self.lease_timeout_seconds
+
+        try:
+            web_driver_manager = self.available_web_driver_managers.get(timeout=timeout_seconds)
+        except queue.Empty:
+            raise WebDriverPoolExhausted(f"No WebDriver became available within {timeout_seconds} seconds.")
+        recycle_reason = self.get_recycle_reason(web_driver_manager, check_health=False)
+        if recycle_reason:
+            # Swaps in the replacement if it has started since the driver was returned
+            web_driver_manager = self.recycle(web_driver_manager, recycle_reason, make_available=False)
+
+        stats = self.stats[id(web_driver_manager)]
+        lease_start_time = time.time()
+        with self.stats_lock:
+            stats["leases"] += 1
+            stats["busy"] = True
+            stats["last_lease_time"] = lease_start_time
+
+        try:
+            yield web_driver_manager
+        except Exception:
+            with self.stats_lock:
+                stats["failures"] += 1
+            web_driver_manager.record_render(succeeded=False)
+            raise
+        finally:
+            with self.stats_lock:
+                stats["busy"] = False
+                stats["busy_seconds"] += time.time() - lease_start_time
+            self.release(web_driver_manager)
+
+    def release(self, web_driver_manager: WebDriverManager):
+        recycle_reason = self.get_recycle_reason(web_driver_manager, check_health=False)
+        if recycle_reason:
+            self.recycle(web_driver_manager, recycle_reason)
+        else:
+            self.available_web_driver_managers.put(web_driver_manager)
+
+    def record_render(self, web_driver_manager: WebDriverManager, succeeded: bool):
+        # Converters swallow their own exceptions, so callers report the outcome of each conversion explicitly
+        web_driver_manager.record_render(succeeded)
+        if not succeeded:
+            with self.stats_lock:
+                self.stats[id(web_driver_manager)]["failures"] += 1
+
+    def get_recycle_reason(self, web_driver_manager: WebDriverManager, check_health: bool) -> Union[str, None]:
+        """
+        :return: Why the driver should be recycled, or None if it is fine to keep using
+        """
+        if self.max_consecutive_failures and web_driver_manager.consecutive_failures >= self.max_consecutive_failures:
+            return f"{web_driver_manager.consecutive_failures} consecutive failures"
+        if self.max_renders and web_driver_manager.render_count >= self.max_renders:
+            return f"{web_driver_manager.render_count} renders"
+        if check_health:
+            if self.max_rss_bytes:
+                rss_bytes = web_driver_manager.get_rss_bytes()
+                if rss_bytes is not None and rss_bytes > self.max_rss_bytes:
+                    return f"{rss_bytes} bytes of memory in use"
+            if not web_driver_manager.is_healthy(self.health_check_timeout_seconds):
+                return "failed health check"
+        return None
+
+    def recycle(self, web_driver_manager: WebDriverManager, reason: str, make_available: bool = True) -> WebDriverManager:
+        """
+        Replace a driver that is not leased with the spare.
+        If no spare is ready, one is started in the background and the old driver keeps its slot until the next recycle,
+        so the caller never waits for a browser to start.
+        The replacement takes the slot before the old browser is shut down.
+        :param make_available: Whether to return the driver that now holds the slot to the pool, instead of to the caller
+        :return: The driver that now holds the slot: the replacement, or the old driver if no replacement was ready
+        """
+        with self.spare_lock:
+            replacement = self.spare_web_driver_manager
+            self.spare_web_driver_manager = None
+
+        if replacement is None:
+            if self.start_spare():
+                logging.warning(f"WebDriver needs recycling after {reason}. It keeps serving until its replacement has started.")
+            if make_available:
+                self.available_web_driver_managers.put(web_driver_manager)
+            return web_driver_manager
+
+        logging.warning(f"Recycling WebDriver after {reason}.")
+        with self.stats_lock:
+            stats = self.stats.pop(id(web_driver_manager))
+            stats["recycles"] += 1
+            stats["last_recycle_reason"] = reason
+            self.stats[id(replacement)] = stats
+            self.web_driver_managers[stats["index"]] = replacement
+            self.recycles += 1
+        if make_available:
+            self.available_web_driver_managers.put(replacement)
+
+        threading.Thread(target=web_driver_manager.quit, name="WebDriverQuit", daemon=True).start()
+        if self.spare_enabled:
+            self.start_spare()
+        return replacement
+
+    def start_spare(self) -> bool:
+        """
+        Start a spare driver in the background, unless one is already ready or starting.
+        :return: Whether a spare started starting
+        """
+        with self.spare_lock:
+            if self.spare_web_driver_manager is not None or self.spare_starting:
+                return False
+            self.spare_starting = True
+        threading.Thread(target=self._start_spare, name="WebDriverSpare", daemon=True).start()
+        return True
 
-    def get_clickable_element(self, element):
-        # Traverse up the DOM to find a clickable element
-        while element:
-            # Ensure the element is not None and has the properties we need to check
+    def _start_spare(self):
+        spare = None
+        try:
+            spare = WebDriverManager(webpage_timeout_seconds=self.webpage_timeout_seconds)
+            logging.info("Spare WebDriver is ready.")
+        except Exception as e:
+            logging.error(f"Could not start a spare WebDriver: {e}")
+        finally:
+            with self.spare_lock:
+                self.spare_web_driver_manager = spare
+                self.spare_starting = False
+
+    def _watch(self):
+        while not self.stop_event.wait(self.health_check_interval_seconds):
+            for index, web_driver_manager in enumerate(list(self.web_driver_managers)):
+                if web_driver_manager is None:
+                    self.start_driver(index)
+
+            # Only idle drivers are checked; a leased driver is checked when it is returned to the pool
+            for _ in range(self.available_web_driver_managers.qsize()):
+                try:
+                    web_driver_manager = self.available_web_driver_managers.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    recycle_reason = self.get_recycle_reason(web_driver_manager, check_health=True)
+                except Exception as e:
+                    recycle_reason = f"health check error: {e}"
+                if recycle_reason:
+                    self.recycle(web_driver_manager, recycle_reason)
+                else:
+                    self.available_web_driver_managers.put(web_driver_manager)
+
+            if self.spare_enabled:
+                with self.spare_lock:
+                    spare = self.spare_web_driver_manager
+                if spare is not None and not spare.is_healthy(self.health_check_timeout_seconds):
+                    with self.spare_lock:
+                        self.spare_web_driver_manager = None
+                    threading.Thread(target=spare.quit, name="WebDriverQuit", daemon=True).start()
+                # Also retries a spare that failed to start
+                self.start_spare()
+
+    def stop(self):
+        """
+        Stop the watchdog and shut down every browser of the pool, including the spare.
+        """
+        self.stop_event.set()
+        with self.spare_lock:
+            spare = self.spare_web_driver_manager
+            self.spare_web_driver_manager = None
+        with self.stats_lock:
+            web_driver_managers = [web_driver_manager for web_driver_manager in self.web_driver_managers if web_driver_manager]
+        for web_driver_manager in web_driver_managers + ([spare] if spare else []):
             try:
-                tag_name = element.tag_name.lower() if element.tag_name else ''
-                onclick = element.get_attribute('onclick')
-                role = element.get_attribute('role')
-                href = element.get_attribute('href')
+                web_driver_manager.quit()
             except Exception as e:
-                # Handle exceptions, which can happen if the element is stale or the WebDriver loses reference to it
-                print(f"Error accessing element properties: {e}")
-                return None
+                logging.error(f"Error shutting down WebDriver: {e}")
+
+    def get_stats(self) -> List[dict]:
+        with self.stats_lock:
+            return [dict(stats) for stats in sorted(self.stats.values(), key=lambda s: s["index"])]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key, so only the first caller does the work
+    and every caller that arrives while it is in progress receives the same result.
+    """
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.exception = None
+            self.waiters = 0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # A dict of key to the call currently in progress for it
+        self.calls: Dict[str, SingleFlight._Call] = {}
+
+    def do(self, key: str, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = SingleFlight._Call()
+                self.calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not is_leader:
+            logging.info(f"Attaching to in-flight call for key: {key}")
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.exception = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                if call.waiters:
+                    logging.info(f"Sharing result of call for key {key} with {call.waiters} other caller(s).")
+                call.done.set()
+
+        if call.exception:
+            raise call.exception
+        return call.result
+
+
+class AssetRecord:
+    def __init__(self, filename: str, mtime: float, size: int):
+        self.filename = filename
+        self.mtime = mtime
+        self.size = size
+        # Updated whenever the asset is served or reused, for least-recently-used eviction
+        self.last_access_time = mtime
+
+    def __repr__(self):
+        return f"AssetRecord(filename={self.filename}, mtime={self.mtime}, size={self.size}, last_access_time={self.last_access_time})"
+
+
+class AssetIndex:
+    """
+    An in-memory index of the files in a storage directory, grouped by URL hash.
+    The directory is scanned once at startup, and the index is kept up to date as assets are written and deleted,
+    so lookups never need to list the directory.
+    """
+    # Suffix of files that are still being written
+    PARTIAL_SUFFIX = ".part"
+    # Separates an asset's filename from the rest of the name of a file derived from it, e.g. {hash}_{timestamp}.pdf~links-2.txt
+    SIDECAR_SEPARATOR = "~"
+
+    def __init__(self, storage_dir: str, remove_partial_files: bool = True):
+        """
+        :param remove_partial_files: Delete files left over from writes interrupted by a restart. Only the process that
+        starts first may do this, since other processes sharing the directory could still be writing their files.
+        """
+        self.storage_dir = storage_dir
+        self.remove_partial_files = remove_partial_files
+        self.lock = threading.Lock()
+        # A dict of URL hash to a dict of filename to AssetRecord
+        self.assets: Dict[str, Dict[str, AssetRecord]] = {}
+        self.total_size = 0
+        self._scan()
+
+    @staticmethod
+    def get_hash(filename: str) -> str:
+        # Assets are named {hash}_{timestamp}.{extension}
+        return filename.split('_', 1)[0]
+
+    @staticmethod
+    def get_sidecar_filename(filename: str, suffix: str) -> str:
+        """
+        :return: The name of a file derived from the asset, which is deleted along with it
+        """
+        return f"{filename}{AssetIndex.SIDECAR_SEPARATOR}{suffix}"
+
+    @staticmethod
+    def get_sidecar_parent(filename: str) -> Union[str, None]:
+        """
+        :return: The filename of the asset a sidecar file was derived from, or None if the file is not a sidecar
+        """
+        if AssetIndex.SIDECAR_SEPARATOR not in filename:
+            return None
+        return filename.split(AssetIndex.SIDECAR_SEPARATOR, 1)[0]
+
+    def _scan(self):
+        start_time = time.time()
+        with os.scandir(self.storage_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(AssetIndex.PARTIAL_SUFFIX):
+                    if self.remove_partial_files:
+                        # Left over from a write that was interrupted by a restart
+                        logging.info(f"Removing partially written file: {entry.name}")
+                        os.remove(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    self._add_record(AssetRecord(entry.name, stat.st_mtime, stat.st_size))
+        for hashed_url in list(self.assets):
+            self._remove_orphaned_sidecars(hashed_url)
+        logging.info(f"Indexed {self.get_asset_count()} assets in {self.storage_dir} "
+                     f"in {round(time.time() - start_time, 4)} seconds.")
+
+    def _add_record(self, record: AssetRecord):
+        with self.lock:
+            records = self.assets.setdefault(self.get_hash(record.filename), {})
+            previous_record = records.get(record.filename)
+            if previous_record:
+                self.total_size -= previous_record.size
+            records[record.filename] = record
+            self.total_size += record.size
+
+    def add(self, filename: str):
+        """
+        Index a file that was just written to the storage directory.
+        """
+        stat = os.stat(os.path.join(self.storage_dir, filename))
+        self._add_record(AssetRecord(filename, stat.st_mtime, stat.st_size))
+
+    def remove(self, filename: str) -> bool:
+        """
+        Delete a file from the storage directory and the index.
+        :return: True if the file was indexed
+        """
+        with self.lock:
+            hashed_url = self.get_hash(filename)
+            records = self.assets.get(hashed_url, {})
+            record = records.pop(filename, None)
+            if not records:
+                self.assets.pop(hashed_url, None)
+            if record:
+                self.total_size -= record.size
+
+        try:
+            os.remove(os.path.join(self.storage_dir, filename))
+        except FileNotFoundError:
+            logging.warning(f"Indexed file was already deleted: {filename}")
+        self._remove_orphaned_sidecars(hashed_url)
+        return record is not None
+
+    def _remove_orphaned_sidecars(self, hashed_url: str):
+        # Sidecar files are only valid for the asset they were derived from
+        with self.lock:
+            records = self.assets.get(hashed_url, {})
+            orphaned_filenames = [filename for filename in records
+                                  if self.get_sidecar_parent(filename) not in (None, *records)]
+            for filename in orphaned_filenames:
+                self.total_size -= records.pop(filename).size
+            if not records:
+                self.assets.pop(hashed_url, None)
+
+        for filename in orphaned_filenames:
+            try:
+                os.remove(os.path.join(self.storage_dir, filename))
+            except FileNotFoundError:
+                pass
+
+    def refresh(self, hashed_url: str):
+        """
+        Drop records of a URL hash whose files were deleted by another process.
+        """
+        with self.lock:
+            records = self.assets.get(hashed_url, {})
+            for filename in [filename for filename in records if not os.path.exists(os.path.join(self.storage_dir, filename))]:
+                self.total_size -= records.pop(filename).size
+            if not records:
+                self.assets.pop(hashed_url, None)
+        self._remove_orphaned_sidecars(hashed_url)
+
+    def contains(self, filename: str) -> bool:
+        with self.lock:
+            return filename in self.assets.get(self.get_hash(filename), {})
+
+    def discover(self, filename: str) -> bool:
+        """
+        Like contains, but a file that is missing from the index is looked up on disk once and indexed if it exists,
+        e.g. when another process wrote it and this process has not been told yet.
+        :return: Whether the file is in the storage directory
+        """
+        if self.contains(filename):
+            return True
+        # Only files directly inside the storage directory are assets
+        if (os.path.basename(filename) != filename or filename in ('.', '..')
+                or filename.endswith(AssetIndex.PARTIAL_SUFFIX)):
+            return False
+        try:
+            self.add(filename)
+        except OSError:
+            return False
+        logging.info(f"Indexed {filename}, which was found on disk.")
+        return True
+
+    def get_record(self, filename: str) -> Union[AssetRecord, None]:
+        with self.lock:
+            return self.assets.get(self.get_hash(filename), {}).get(filename)
 
-            if tag_name in ['a', 'button'] or onclick or (href and tag_name == 'a'):
-                return element
-            if role == 'button':
-                return element
+    def touch(self, filename: str):
+        with self.lock:
+            record = self.assets.get(self.get_hash(filename), {}).get(filename)
+            if record:
+                record.last_access_time = time.time()
 
-            # Move to the next parent element safely
+    def get_all_records(self) -> List[AssetRecord]:
+        with self.lock:
+            return [record for records in self.assets.values() for record in records.values()]
+
+    def get_asset_groups(self) -> List[Tuple[AssetRecord, List[AssetRecord]]]:
+        """
+        :return: Each asset that is not a sidecar file, with the sidecar files derived from it
+        """
+        with self.lock:
+            groups = []
+            for records in self.assets.values():
+                sidecars: Dict[str, List[AssetRecord]] = {}
+                for record in records.values():
+                    parent_filename = self.get_sidecar_parent(record.filename)
+                    if parent_filename is not None:
+                        sidecars.setdefault(parent_filename, []).append(record)
+                groups.extend((record, sidecars.get(record.filename, [])) for record in records.values()
+                              if self.get_sidecar_parent(record.filename) is None)
+            return groups
+
+    def get_records(self, hashed_url: str, extension: str) -> List[AssetRecord]:
+        with self.lock:
+            return [record for record in self.assets.get(hashed_url, {}).values()
+                    if record.filename.endswith(extension) and self.SIDECAR_SEPARATOR not in record.filename]
+
+    def get_newest_record(self, hashed_url: str, extension: str) -> Union[AssetRecord, None]:
+        records = self.get_records(hashed_url, extension)
+        return max(records, key=lambda record: record.mtime) if records else None
+
+    def get_asset_count(self) -> int:
+        with self.lock:
+            return sum(len(records) for records in self.assets.values())
+
+
+class RetentionWorker:
+    """
+    Periodically deletes assets from the indexed storage directories in the background.
+    Assets older than the max age are always deleted. If the directories together still exceed the byte quota,
+    the least recently accessed assets are deleted until they fit.
+    """
+    def __init__(self, asset_indexes: List[AssetIndex], interval_seconds: int, max_age_seconds: int,
+                 max_total_bytes: int, on_remove=None):
+        """
+        :param on_remove: Called with (asset_index, filename) after an asset is deleted
+        """
+        self.asset_indexes = asset_indexes
+        self.interval_seconds = interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self.on_remove = on_remove
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="RetentionWorker", daemon=True)
+
+    def start(self):
+        if self.max_age_seconds <= 0 and self.max_total_bytes <= 0:
+            logging.info("Retention worker disabled because neither a max age nor a byte quota is configured.")
+            return
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval_seconds):
             try:
-                element = self.driver.execute_script("return arguments[0].parentNode;", element)
+                self.enforce()
             except Exception as e:
-                print(f"Error moving to parent element: {e}")
+                logging.error(f"Error enforcing retention: {e}")
+
+    def _remove(self, asset_index: AssetIndex, record: AssetRecord):
+        asset_index.remove(record.filename)
+        if self.on_remove:
+            self.on_remove(asset_index, record.filename)
+
+    def enforce(self):
+        removed_count = 0
+        removed_bytes = 0
+
+        # Sidecar files, e.g. image tiles, are only ever deleted along with the asset they were derived from,
+        # so an asset is never kept with some of its files missing
+        if self.max_age_seconds > 0:
+            now = time.time()
+            for asset_index in self.asset_indexes:
+                for record, sidecars in asset_index.get_asset_groups():
+                    if now - record.mtime > self.max_age_seconds and asset_index.contains(record.filename):
+                        self._remove(asset_index, record)
+                        removed_count += 1
+                        removed_bytes += record.size + sum(sidecar.size for sidecar in sidecars)
+
+        if self.max_total_bytes > 0:
+            total_bytes = sum(asset_index.total_size for asset_index in self.asset_indexes)
+            if total_bytes > self.max_total_bytes:
+                # An asset counts as accessed when any of its files was, e.g. one tile of an image
+                candidates = [(max(file_record.last_access_time for file_record in (record, *sidecars)),
+                               asset_index, record, sidecars)
+                              for asset_index in self.asset_indexes
+                              for record, sidecars in asset_index.get_asset_groups()]
+                candidates.sort(key=lambda candidate: candidate[0])
+                for _, asset_index, record, sidecars in candidates:
+                    if total_bytes <= self.max_total_bytes:
+                        break
+                    if not asset_index.contains(record.filename):
+                        continue
+                    self._remove(asset_index, record)
+                    # Also counts the sidecar files removed along with the asset
+                    total_bytes = sum(index.total_size for index in self.asset_indexes)
+                    removed_count += 1
+                    removed_bytes += record.size + sum(sidecar.size for sidecar in sidecars)
+
+        if removed_count:
+            logging.info(f"Retention removed {removed_count} assets ({removed_bytes} bytes).")
+
+
+class RenderCacheEntry:
+    def __init__(self, safe_filename: str, status_code: int, etag: str = None, last_modified: str = None,
+                 validation_url: str = None):
+        self.safe_filename = safe_filename
+        self.status_code = status_code
+        self.etag = etag
+        self.last_modified = last_modified
+        # The URL the validators belong to, which is the end of the redirect chain
+        self.validation_url = validation_url
+
+    def to_dict(self) -> dict:
+        return {"status_code": self.status_code,
+                "etag": self.etag,
+                "last_modified": self.last_modified,
+                "validation_url": self.validation_url}
+
+
+class RenderCache:
+    """
+    Reuses PDFs that already exist in the storage directory instead of rendering the URL again.
+    Files are named {md5(url)}_{timestamp}.pdf, so the newest file for a URL's hash is its most recent render.
+    The status code and validators of each render are saved in a sidecar file, so renders can be reused after a restart.
+    """
+    METADATA_SUFFIX = "render.json"
+
+    def __init__(self, asset_index: AssetIndex, extension: str, revalidate: bool, revalidate_timeout_seconds: int,
+                 cache_error_pages: bool = False):
+        """
+        :param cache_error_pages: Whether to reuse renders of pages that responded with a status code other than 2xx
+        """
+        self.asset_index = asset_index
+        self.extension = extension
+        self.revalidate = revalidate
+        self.revalidate_timeout_seconds = revalidate_timeout_seconds
+        self.cache_error_pages = cache_error_pages
+        self.lock = threading.Lock()
+        # A dict of requested URL to its most recent render.
+        # This also covers URLs that redirected, whose files are named after the final URL's hash.
+        self.entries: Dict[str, RenderCacheEntry] = {}
+
+    def lookup(self, url: str, max_age_seconds: int, cache_key: str = None) -> Union[Tuple[str, int], None]:
+        """
+        :param cache_key: Identifies the render options as well as the URL. Defaults to the URL.
+        :return: (safe_filename, status_code) of a render of the URL no older than max_age_seconds, or None
+        """
+        if max_age_seconds <= 0:
+            return None
+        if cache_key is None:
+            cache_key = url
+
+        with self.lock:
+            entry = self.entries.get(cache_key)
+
+        if entry is None:
+            newest_record = self.asset_index.get_newest_record(Converter.hash_url(cache_key), self.extension)
+            if not newest_record:
+                return None
+            # Renders from before a restart are only reused if their status code was saved with them
+            entry = self.read_metadata(newest_record.filename)
+            if entry is None or not self.is_cacheable(entry.status_code):
                 return None
+            with self.lock:
+                self.entries.setdefault(cache_key, entry)
+
+        record = self.asset_index.get_record(entry.safe_filename)
+        if not record:
+            # The file was pruned since it was cached
+            with self.lock:
+                self.entries.pop(cache_key, None)
+            return None
 
-        return None
+        age_seconds = time.time() - record.mtime
+
+        if age_seconds > max_age_seconds:
+            return None
 
+        if self.revalidate and not self.is_unmodified(url, entry):
+            logging.info(f"Cached render {entry.safe_filename} of {url} is stale according to the origin.")
+            return None
+
+        logging.info(f"Reusing cached render {entry.safe_filename} of {url}, which is {round(age_seconds)} seconds old.")
+        self.asset_index.touch(entry.safe_filename)
+        return entry.safe_filename, entry.status_code
+
+    def store(self, url: str, safe_filename: str, status_code: int, etag: str = None, last_modified: str = None,
+              validation_url: str = None, cache_key: str = None):
+        """
+        :param etag: ETag of the rendered page's response, used for revalidation
+        :param last_modified: Last-Modified of the rendered page's response, used for revalidation
+        :param validation_url: URL that responded with the validators, if it differs from the requested URL
+        :param cache_key: Identifies the render options as well as the URL. Defaults to the URL.
+        """
+        if not self.is_cacheable(status_code):
+            # Don't keep serving an older render in place of the page's current response either
+            with self.lock:
+                self.entries.pop(cache_key or url, None)
+            return
+
+        entry = RenderCacheEntry(safe_filename=safe_filename,
+                                 status_code=status_code,
+                                 etag=etag,
+                                 last_modified=last_modified,
+                                 validation_url=validation_url)
+        with self.lock:
+            self.entries[cache_key or url] = entry
+        self.write_metadata(entry)
+
+    def is_cacheable(self, status_code: Union[int, None]) -> bool:
+        if status_code is None:
+            return False
+        return self.cache_error_pages or 200 <= status_code < 300
+
+    def write_metadata(self, entry: RenderCacheEntry):
+        metadata_filename = AssetIndex.get_sidecar_filename(entry.safe_filename, RenderCache.METADATA_SUFFIX)
+        metadata_path = os.path.join(self.asset_index.storage_dir, metadata_filename)
+        temporary_path = f"{metadata_path}{AssetIndex.PARTIAL_SUFFIX}"
+        try:
+            with open(temporary_path, "w", encoding='utf-8') as f:
+                json.dump(entry.to_dict(), f)
+            os.replace(temporary_path, metadata_path)
+            self.asset_index.add(metadata_filename)
+        except OSError as e:
+            # The render is still cached in memory until a restart
+            logging.error(f"Error saving the status of render {entry.safe_filename}: {e}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def read_metadata(self, safe_filename: str) -> Union[RenderCacheEntry, None]:
+        """
+        :return: The entry saved with a render by write_metadata, or None if there is none
+        """
+        metadata_filename = AssetIndex.get_sidecar_filename(safe_filename, RenderCache.METADATA_SUFFIX)
+        if not self.asset_index.contains(metadata_filename):
+            return None
+        try:
+            with open(os.path.join(self.asset_index.storage_dir, metadata_filename), encoding='utf-8') as f:
+                metadata = json.load(f)
+            return RenderCacheEntry(safe_filename=safe_filename,
+                                    status_code=metadata["status_code"],
+                                    etag=metadata.get("etag"),
+                                    last_modified=metadata.get("last_modified"),
+                                    validation_url=metadata.get("validation_url"))
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring the saved status of render {safe_filename}: {e}")
+            return None
+
+    def is_unmodified(self, url: str, entry: RenderCacheEntry) -> bool:
+        if not entry.etag and not entry.last_modified:
+            # Nothing to revalidate against, so rely on the max age alone
+            return True
+
+        head_request = urllib.request.Request(entry.validation_url or url, method="HEAD")
+        if entry.etag:
+            head_request.add_header("If-None-Match", entry.etag)
+        if entry.last_modified:
+            head_request.add_header("If-Modified-Since", entry.last_modified)
+
+        try:
+            with urllib.request.urlopen(head_request, timeout=self.revalidate_timeout_seconds):
+                # A 2xx response means the origin sent the resource again rather than confirming it is unchanged
+                return False
+        except urllib.error.HTTPError as e:
+            return e.code == 304
+        except Exception as e:
+            logging.warning(f"Failed to revalidate {url}: {e}")
+            return False
+
+
+class ConversionJob:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, url: str, priority: int, sequence: int, max_age_seconds: int, fresh: bool,
+                 render_options: RenderOptions):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.priority = priority
+        # Breaks ties between equal priorities in submission order
+        self.sequence = sequence
+        self.max_age_seconds = max_age_seconds
+        self.fresh = fresh
+        self.render_options = render_options
+        self.state = ConversionJob.QUEUED
+        self.submitted_time = time.time()
+        self.started_time = None
+        self.finished_time = None
+        self.safe_filename = None
+        self.status_code = None
+        self.done = threading.Event()
+
+    def __lt__(self, other: "ConversionJob"):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    def __repr__(self):
+        return f"ConversionJob(id={self.id}, url={self.url}, priority={self.priority}, state={self.state})"
+
+
+class ConversionJobQueueFull(Exception):
+    pass
+
+
+class ConversionJobQueue:
+    """
+    A bounded priority queue of conversion jobs, consumed by worker threads.
+    Jobs with a lower priority number run first. Finished jobs are kept for result_ttl_seconds so clients can poll them.
+    """
+    def __init__(self, convert, worker_count: int, max_size: int, result_ttl_seconds: int):
+        """
+        :param convert: Called with (url, max_age_seconds, fresh, render_options) and returns (safe_filename, status_code)
+        """
+        self.convert = convert
+        self.result_ttl_seconds = result_ttl_seconds
+        self.queue: "queue.PriorityQueue[ConversionJob]" = queue.PriorityQueue(maxsize=max_size)
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        # A dict of job id to ConversionJob
+        self.jobs: Dict[str, ConversionJob] = {}
+        self.workers = [threading.Thread(target=self._work, name=f"ConversionJobWorker-{i}", daemon=True)
+                        for i in range(max(1, worker_count))]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, url: str, priority: int, max_age_seconds: int, fresh: bool,
+               render_options: RenderOptions) -> ConversionJob:
+        """
+        :raises ConversionJobQueueFull: If the queue already holds its maximum number of jobs
+        """
+        self._prune_finished_jobs()
+        job = ConversionJob(url=url, priority=priority, sequence=next(self.sequence),
+                            max_age_seconds=max_age_seconds, fresh=fresh, render_options=render_options)
+        with self.lock:
+            self.jobs[job.id] = job
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job.id]
+            raise ConversionJobQueueFull(f"The conversion queue is full ({self.queue.maxsize} jobs).")
+        logging.info(f"Queued {job}")
+        return job
+
+    def get_job(self, job_id: str) -> Union[ConversionJob, None]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def get_position(self, job: ConversionJob) -> int:
+        """
+        :return: Number of queued jobs that will run before this one, or 0 if it is no longer queued
+        """
+        if job.state != ConversionJob.QUEUED:
+            return 0
+        with self.queue.mutex:
+            return sum(1 for queued_job in self.queue.queue if queued_job < job)
+
+    def get_depth(self) -> int:
+        return self.queue.qsize()
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            job.state = ConversionJob.RUNNING
+            job.started_time = time.time()
+            try:
+                job.safe_filename, job.status_code = self.convert(job.url, job.max_age_seconds, job.fresh, job.render_options)
+            except Exception as e:
+                logging.error(f"Error running {job}: {e}")
+            job.state = ConversionJob.DONE if job.safe_filename else ConversionJob.FAILED
+            job.finished_time = time.time()
+            logging.info(f"Finished {job} in {round(job.finished_time - job.started_time, 4)} seconds.")
+            job.done.set()
+            self.queue.task_done()
+
+    def _prune_finished_jobs(self):
+        now = time.time()
+        with self.lock:
+            expired_job_ids = [job_id for job_id, job in self.jobs.items()
+                               if job.finished_time and now - job.finished_time > self.result_ttl_seconds]
+            for job_id in expired_job_ids:
+                del self.jobs[job_id]
 
 
 class Converter(ABC):
 
     @abstractmethod
-    def convert_webpage(self, driver, url: str = None) -> (str, int):
+    def convert_webpage(self, driver, url: str = None, render_options: RenderOptions = None,
+                        cdp_event_monitor: CdpEventMonitor = None, stage_timer: StageTimer = None) -> (str, int):
         pass
 
-    def prune_old_assets(self, storage_dir: str, encoded_url: str, extension: str, prune_seconds: int):
-        for file in os.listdir(storage_dir):
-            if file.startswith(f"{encoded_url}_") and file.endswith(extension):
-                if time.time() - os.path.getmtime(os.path.join(storage_dir, file)) > prune_seconds:
-                    logging.info(f"Pruning old file: {file}")
-                    os.remove(os.path.join(storage_dir, file))
+    def prune_old_assets(self, asset_index: AssetIndex, encoded_url: str, extension: str, prune_seconds: int):
+        for record in asset_index.get_records(encoded_url, extension):
+            if time.time() - record.mtime > prune_seconds:
+                logging.info(f"Pruning old file: {record.filename}")
+                asset_index.remove(record.filename)
 
     @staticmethod
     def await_webpage_load(driver, webpage_load_seconds) -> bool:
@@ -168,6 +1803,36 @@ class Converter(ABC):
             time.sleep(0.1)
         return False
 
+    @staticmethod
+    def await_webpage_readiness(driver, cdp_event_monitor: Union[CdpEventMonitor, None], readiness_mode: str,
+                                webpage_load_seconds) -> bool:
+        if readiness_mode == CdpEventMonitor.READYSTATE or cdp_event_monitor is None:
+            return Converter.await_webpage_load(driver, webpage_load_seconds)
+        return cdp_event_monitor.wait_until_ready(mode=readiness_mode,
+                                                  timeout_seconds=webpage_load_seconds,
+                                                  quiet_seconds=READINESS_QUIET_SECONDS,
+                                                  max_inflight_requests=READINESS_MAX_INFLIGHT_REQUESTS)
+
+    @staticmethod
+    def hash_url(url: str) -> str:
+        # Use a hash of the URL to keep the filename short and manageable
+        return hashlib.md5(url.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_navigation_status_code(driver, cdp_event_monitor: Union[CdpEventMonitor, None]) -> int:
+        """
+        :return: HTTP status code of the last navigation, recorded from CDP events if possible,
+        otherwise by fetching the current URL again
+        """
+        if cdp_event_monitor:
+            navigation = cdp_event_monitor.get_navigation()
+            if navigation.status_code is not None:
+                if navigation.redirect_chain:
+                    logging.info(f"Redirect chain: {navigation.redirect_chain}")
+                return navigation.status_code
+            logging.warning("No HTTP status code was recorded for the navigation. Fetching the page again.")
+        return Converter.get_http_status_code(driver)
+
     @staticmethod
     def get_http_status_code(driver) -> int:
         current_url = driver.current_url
@@ -217,47 +1882,91 @@ class Page:
         return f"Page(number={self.number}, size={self.size}, links={self.links})"
 
 class PDFConverter(Converter):
-
-    def __init__(self, storage_dir: str, webpage_load_seconds: int, duplicate_pdf_prune_seconds: int):
+    # Link extractions that may wait in the queue with their whole PDF in memory.
+    # Past this, links are extracted from the written file instead.
+    MAX_BUFFERED_LINK_EXTRACTIONS = 2
+
+    def __init__(self, storage_dir: str, webpage_load_seconds: int, duplicate_pdf_prune_seconds: int,
+                 document_cache_max_entries: int = None, document_cache_max_bytes: int = None,
+                 stream_pdf_output: bool = False, pdf_stream_chunk_bytes: int = 1048576,
+                 extract_links: bool = True, remove_partial_files: bool = True):
+        """
+        :param extract_links: Parse the links of each rendered PDF into the document collection in the background
+        :param remove_partial_files: See AssetIndex
+        """
         self.storage_dir = storage_dir
         self.webpage_load_seconds = webpage_load_seconds
         self.duplicate_pdf_prune_seconds = duplicate_pdf_prune_seconds
-        self.document_collection = DocumentCollection()
+        self.stream_pdf_output = stream_pdf_output
+        self.pdf_stream_chunk_bytes = pdf_stream_chunk_bytes
+        self.extract_links_enabled = extract_links
+        self.document_collection = DocumentCollection(max_documents=document_cache_max_entries,
+                                                      max_bytes=document_cache_max_bytes)
 
         if not os.path.exists(storage_dir):
             os.makedirs(storage_dir)
 
-    def convert_webpage(self, driver, url: str = None) -> (str, int):
+        self.asset_index = AssetIndex(storage_dir, remove_partial_files=remove_partial_files)
+        # Extracts links from rendered PDFs off the request thread
+        self.link_extraction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LinkExtraction")
+        self.buffered_link_extractions = threading.BoundedSemaphore(PDFConverter.MAX_BUFFERED_LINK_EXTRACTIONS)
+
+    def convert_webpage(self, driver, url: str = None, render_options: RenderOptions = None,
+                        cdp_event_monitor: CdpEventMonitor = None, stage_timer: StageTimer = None) -> (str, int):
+        """
+        :param stage_timer: Receives how long each stage of the conversion took
+        """
         try:
+            if render_options is None:
+                render_options = RenderOptions()
+            if stage_timer is None:
+                stage_timer = StageTimer()
             if not url:
                 logging.info("No URL provided. Using the current URL in the WebDriver.")
                 url = driver.current_url
 
-            driver.get(url)
+            with stage_timer.stage("navigate"):
+                if cdp_event_monitor:
+                    cdp_event_monitor.reset()
+                driver.get(url)
 
-            status_code = self.get_http_status_code(driver)
+            with stage_timer.stage("status"):
+                status_code = self.get_navigation_status_code(driver, cdp_event_monitor)
 
             logging.info(f"Accessed webpage '{url}' successfully, with HTTP status code {status_code}. "
-                         f"Waiting {WEBPAGE_LOAD_SECONDS} seconds for it to "
-                         f"load before creating PDF...")
+                         f"Waiting up to {self.webpage_load_seconds} seconds for it to "
+                         f"load before creating PDF (readiness mode: {render_options.readiness_mode})...")
 
-            await_webpage_load_result = PDFConverter.await_webpage_load(driver, self.webpage_load_seconds)
+            with stage_timer.stage("readiness"):
+                await_webpage_load_result = self.await_webpage_readiness(driver, cdp_event_monitor,
+                                                                         render_options.readiness_mode,
+                                                                         self.webpage_load_seconds)
             if not await_webpage_load_result:
-                logging.warning(f"Webpage '{url}' did not reach readyState within {self.webpage_load_seconds} seconds.")
-
-            # Check if the URL changed
-            if driver.current_url != url:
-                logging.info(f"URL changed to {driver.current_url}. Reassigning URL.")
-                # Sleep for 1 second because there may be multiple redirects
-                time.sleep(1)
-                url = driver.current_url
-                logging.info(f"New URL: {url}")
-                # We now must await webpage load again
-                await_webpage_load_result = PDFConverter.await_webpage_load(driver, self.webpage_load_seconds)
-                if not await_webpage_load_result:
-                    logging.warning(f"Webpage '{url}' accessed after redirect did not reach readyState within {self.webpage_load_seconds} seconds.")
-
-            result = driver.execute_cdp_cmd("Page.printToPDF", {
+                logging.warning(f"Webpage '{url}' was not ready within {self.webpage_load_seconds} seconds.")
+
+            with stage_timer.stage("redirect"):
+                # Check if the URL changed
+                if driver.current_url != url:
+                    logging.info(f"URL changed to {driver.current_url}. Reassigning URL.")
+                    if render_options.readiness_mode == CdpEventMonitor.READYSTATE or cdp_event_monitor is None:
+                        # Sleep for 1 second because there may be multiple redirects
+                        time.sleep(1)
+                        url = driver.current_url
+                        logging.info(f"New URL: {url}")
+                        # We now must await webpage load again
+                        await_webpage_load_result = PDFConverter.await_webpage_load(driver, self.webpage_load_seconds)
+                        if not await_webpage_load_result:
+                            logging.warning(f"Webpage '{url}' accessed after redirect did not reach readyState within {self.webpage_load_seconds} seconds.")
+                    else:
+                        # The CDP readiness wait already covered every navigation in the redirect chain
+                        url = driver.current_url
+                        logging.info(f"New URL: {url}")
+
+            if cdp_event_monitor and cdp_event_monitor.navigation.status_code is not None:
+                # Client-side redirects during the wait replace the status of the first navigation
+                status_code = cdp_event_monitor.navigation.status_code
+
+            print_options = {
                 "landscape": False,
                 "printBackground": True,
                 "marginTop": 0,
@@ -265,31 +1974,102 @@ class PDFConverter(Converter):
                 "marginLeft": 0,
                 "marginRight": 0,
                 "preferCSSPageSize": True
-            })
+            }
+            if self.stream_pdf_output:
+                # Chrome keeps the PDF and hands out a stream handle, which is read in chunks below
+                print_options["transferMode"] = "ReturnAsStream"
+            with stage_timer.stage("print"):
+                result = driver.execute_cdp_cmd("Page.printToPDF", print_options)
 
-            hashed_url = hashlib.md5(url.encode('utf-8')).hexdigest()
+            hashed_url = self.hash_url(render_options.get_cache_key(url))
 
-            for file in os.listdir(self.storage_dir):
-                if file.startswith(f"{hashed_url}_") and file.endswith(".pdf"):
-                    if time.time() - os.path.getmtime(os.path.join(self.storage_dir, file)) > DUPLICATE_PDF_PRUNE_SECONDS:
-                        logging.info(f"Pruning old PDF file: {file}")
-                        os.remove(os.path.join(self.storage_dir, file))
+            with stage_timer.stage("prune"):
+                self.prune_old_assets(asset_index=self.asset_index,
+                                      encoded_url=hashed_url,
+                                      extension='.pdf',
+                                      prune_seconds=self.duplicate_pdf_prune_seconds)
 
             safe_filename = f"{hashed_url}_{int(time.time())}.pdf"
             output_file_path = os.path.join(self.storage_dir, safe_filename)
 
-            with open(output_file_path, "wb") as f:
-                f.write(base64.b64decode(result['data']))
+            if self.stream_pdf_output:
+                self.write_pdf_stream(driver, result['stream'], output_file_path, stage_timer)
+                if self.extract_links_enabled:
+                    # The PDF was never fully in memory, so the links are extracted from the file, which is still cached by the OS
+                    self.link_extraction_executor.submit(self.extract_links, output_file_path, None)
+            else:
+                with stage_timer.stage("decode"):
+                    pdf_data = base64.b64decode(result['data'])
+                # Build the link map from the decoded PDF while it is written, rather than reading the file back,
+                # unless a burst of conversions already holds enough PDFs in memory for their queued extractions
+                buffered = self.extract_links_enabled and self.buffered_link_extractions.acquire(blocking=False)
+                if buffered:
+                    future = self.link_extraction_executor.submit(self.extract_links, output_file_path, pdf_data)
+                    future.add_done_callback(lambda _: self.buffered_link_extractions.release())
+
+                with stage_timer.stage("write"):
+                    with open(output_file_path, "wb") as f:
+                        f.write(pdf_data)
+                if self.extract_links_enabled and not buffered:
+                    self.link_extraction_executor.submit(self.extract_links, output_file_path, None)
+            self.asset_index.add(safe_filename)
 
             logging.info(f"PDF file created: {os.path.abspath(output_file_path)}")
 
-            self.document_collection.add_document(local_file_path=output_file_path)
-
             return safe_filename, status_code
         except Exception as e:
             logging.error(f"Error converting URL to PDF: {e}")
             return None, None
 
+    def write_pdf_stream(self, driver, stream_handle: str, output_file_path: str, stage_timer: StageTimer = None):
+        """
+        Read a PDF from a CDP stream in chunks, decoding and writing each one as it arrives,
+        so memory use doesn't grow with the size of the PDF.
+        The PDF is written to a temporary file which is renamed once complete, so a partial PDF is never served.
+        """
+        if stage_timer is None:
+            stage_timer = StageTimer()
+        temporary_file_path = f"{output_file_path}{AssetIndex.PARTIAL_SUFFIX}"
+        # Base64 characters left over from a chunk, that don't yet form a whole 4-character group
+        remainder = ""
+        try:
+            with open(temporary_file_path, "wb") as f:
+                while True:
+                    # Chrome generates the PDF while it is read, so reading counts towards printing
+                    with stage_timer.stage("print"):
+                        chunk = driver.execute_cdp_cmd("IO.read", {"handle": stream_handle, "size": self.pdf_stream_chunk_bytes})
+                    with stage_timer.stage("decode"):
+                        if chunk.get('base64Encoded'):
+                            data = remainder + chunk['data']
+                            whole_groups_length = len(data) - len(data) % 4
+                            decoded_data = base64.b64decode(data[:whole_groups_length])
+                            remainder = data[whole_groups_length:]
+                        else:
+                            # CDP sends text chunks as UTF-8
+                            decoded_data = chunk['data'].encode('utf-8')
+                    with stage_timer.stage("write"):
+                        f.write(decoded_data)
+                    if chunk.get('eof'):
+                        break
+            if remainder:
+                # Chrome pads the last base64 chunk, so leftover characters mean the PDF was cut off
+                raise ValueError(f"The PDF stream ended with {len(remainder)} base64 characters that don't form a whole group.")
+            os.replace(temporary_file_path, output_file_path)
+        finally:
+            driver.execute_cdp_cmd("IO.close", {"handle": stream_handle})
+            if os.path.exists(temporary_file_path):
+                os.remove(temporary_file_path)
+
+    def extract_links(self, local_file_path: str, pdf_data: Union[bytes, None]):
+        try:
+            # Runs after the conversion has returned, so it is recorded on its own
+            start_time = time.perf_counter()
+            self.document_collection.add_document(local_file_path=local_file_path, stream=pdf_data)
+            CONVERSION_STAGE_SECONDS.observe(time.perf_counter() - start_time, converter="pdf", stage="link_extraction")
+        except Exception as e:
+            # click will load the document from the file instead
+            logging.error(f"Error extracting links from {local_file_path}: {e}")
+
     def click(self, normalized_x: float, normalized_y: float, page_index: int, pdf_filename: str) -> Union[str, None]:
         """
         :param normalized_x:
@@ -299,14 +2079,9 @@ class PDFConverter(Converter):
         :return: URL which can be accessed by clicking at the given coordinates, or None if no URL is found
         """
 
-        document = self.document_collection.get_document_by_filename(filename=pdf_filename)
+        document = self.get_document(pdf_filename)
         if not document:
-            try:
-                self.document_collection.add_document(local_file_path=os.path.join(self.storage_dir, pdf_filename))
-                document = self.document_collection.get_document_by_filename(filename=pdf_filename)
-            except FileNotFoundError:
-                logging.error(f"PDF file not found: {pdf_filename}")
-                return None
+            return None
 
         url = document.get_url_at_position(normalized_x, normalized_y, normalized_coordinates=True, page_index=page_index)
         if url:
@@ -316,74 +2091,570 @@ class PDFConverter(Converter):
             logging.info(f"No URL found at position ({normalized_x}, {normalized_y}) on page {page_index} for PDF {pdf_filename}")
             return None
 
+    def click_many(self, positions: List[Tuple[int, float, float]], pdf_filename: str) -> Union[List[Union[str, None]], None]:
+        """
+        :param positions: (page_index, normalized_x, normalized_y) tuples
+        :param pdf_filename:
+        :return: For each position, the URL which can be accessed by clicking there or None,
+        or None if the PDF file is not found
+        """
+        document = self.get_document(pdf_filename)
+        if not document:
+            return None
+
+        urls = [document.get_url_at_position(normalized_x, normalized_y, normalized_coordinates=True, page_index=page_index)
+                for page_index, normalized_x, normalized_y in positions]
+        logging.info(f"Found URLs at {sum(1 for url in urls if url)} of {len(positions)} positions for PDF {pdf_filename}")
+        return urls
+
+    def get_link_map(self, pdf_filename: str, precision: Union[int, None]) -> Union[str, None]:
+        """
+        :param precision: Digits after the decimal point of the dimensions, or None to not round them
+        :return: The PDF's links encoded as a Resonite string, or None if the PDF file is not found.
+        The encoded string is cached in a sidecar file next to the PDF, which is deleted along with it.
+        """
+        if not self.asset_index.discover(pdf_filename):
+            logging.error(f"PDF file not found: {pdf_filename}")
+            return None
+
+        sidecar_filename = AssetIndex.get_sidecar_filename(pdf_filename, f"links-{'full' if precision is None else precision}.txt")
+        sidecar_path = os.path.join(self.storage_dir, sidecar_filename)
+        if self.asset_index.contains(sidecar_filename):
+            try:
+                with open(sidecar_path, encoding='utf-8') as f:
+                    link_map = f.read()
+                LINK_MAP_REQUESTS.inc(result="hit")
+                self.asset_index.touch(pdf_filename)
+                return link_map
+            except FileNotFoundError:
+                # Deleted since the lookup; encode it again
+                pass
+
+        document = self.get_document(pdf_filename)
+        if not document:
+            return None
+        link_map = document.get_resonite_string(precision)
+        LINK_MAP_REQUESTS.inc(result="miss")
+
+        # Concurrent requests may encode the same link map, so each writes its own temporary file
+        temporary_path = f"{sidecar_path}.{threading.get_ident()}{AssetIndex.PARTIAL_SUFFIX}"
+        try:
+            with open(temporary_path, "w", encoding='utf-8') as f:
+                f.write(link_map)
+            os.replace(temporary_path, sidecar_path)
+            self.asset_index.add(sidecar_filename)
+        except OSError as e:
+            logging.error(f"Error caching link map of {pdf_filename}: {e}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        return link_map
+
+    def get_document(self, pdf_filename: str) -> Union[Document, None]:
+        """
+        :return: The parsed document for the PDF file, loading it from storage if it is not in the collection,
+        or None if the file is not found
+        """
+        document = self.document_collection.get_document_by_filename(filename=pdf_filename)
+        if not document:
+            try:
+                start_time = time.perf_counter()
+                self.document_collection.add_document(local_file_path=os.path.join(self.storage_dir, pdf_filename))
+                CONVERSION_STAGE_SECONDS.observe(time.perf_counter() - start_time, converter="pdf", stage="link_extraction")
+                document = self.document_collection.get_document_by_filename(filename=pdf_filename)
+            except FileNotFoundError:
+                logging.error(f"PDF file not found: {pdf_filename}")
+                return None
+
+        self.asset_index.touch(pdf_filename)
+        return document
+
 class ImageConverter(Converter):
-    def __init__(self, storage_dir: str, webpage_load_seconds: int, duplicate_image_prune_seconds: int):
+    """
+    Captures webpages as fixed-size image tiles with Page.captureScreenshot, and describes them in a JSON manifest.
+    Each tile is captured from a clipped region of the page, so memory use is bounded by the tile size instead of
+    growing with the height of the page. The tiles are sidecar files of the manifest, so they are deleted with it.
+    The links of the page are saved in a link map sidecar file at capture time, so clicks on the tiles are resolved
+    without a browser.
+    """
+    MANIFEST_EXTENSION = '.json'
+    LINK_MAP_SUFFIX = 'links.json'
+    # Collects the page coordinates and URL of every visible link in one round trip.
+    # Links that wrap over several lines have a rectangle for each line.
+    GET_LINKS_SCRIPT = """
+        const links = [];
+        for (const element of document.querySelectorAll('a[href]')) {
+            if (!/^https?:/i.test(element.href)) {
+                continue;
+            }
+            for (const rect of element.getClientRects()) {
+                if (rect.width > 0 && rect.height > 0) {
+                    links.push([rect.left + window.scrollX, rect.top + window.scrollY, rect.width, rect.height, element.href]);
+                }
+            }
+        }
+        return links;
+    """
+
+    def __init__(self, storage_dir: str, webpage_load_seconds: int, duplicate_image_prune_seconds: int,
+                 tile_height: int = IMAGE_TILE_HEIGHT, max_height: int = IMAGE_MAX_HEIGHT,
+                 document_cache_max_entries: int = None, document_cache_max_bytes: int = None,
+                 remove_partial_files: bool = True):
+        """
+        :param tile_height: Height of each tile in CSS pixels
+        :param max_height: Pages taller than this many CSS pixels are cut off
+        :param remove_partial_files: See AssetIndex
+        """
         self.storage_dir = storage_dir
         self.webpage_load_seconds = webpage_load_seconds
         self.duplicate_image_prune_seconds = duplicate_image_prune_seconds
+        self.tile_height = max(1, tile_height)
+        self.max_height = max(1, max_height)
+        # Link maps of captured pages, by manifest filename, with a page for each tile
+        self.document_collection = DocumentCollection(max_documents=document_cache_max_entries,
+                                                      max_bytes=document_cache_max_bytes)
 
         if not os.path.exists(storage_dir):
             os.makedirs(storage_dir)
 
+        self.asset_index = AssetIndex(storage_dir, remove_partial_files=remove_partial_files)
+
+
+    @staticmethod
+    def get_page_size(driver) -> (int, int):
+        """
+        :return: The width of the viewport and the height of the page's content, in CSS pixels
+        """
+        layout_metrics = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+        # The css* metrics are in CSS pixels, the older ones are in device pixels
+        viewport = layout_metrics.get('cssLayoutViewport') or layout_metrics['layoutViewport']
+        content_size = layout_metrics.get('cssContentSize') or layout_metrics['contentSize']
+        return math.ceil(viewport['clientWidth']), math.ceil(content_size['height'])
+
+    def index_manifest(self, manifest_filename: str):
+        """
+        Add a manifest written by this or another process to the asset index, along with its tiles.
+        """
+        with open(os.path.join(self.storage_dir, manifest_filename)) as f:
+            manifest = json.load(f)
+        # The manifest is indexed first, so its tiles aren't mistaken for orphaned sidecar files
+        self.asset_index.add(manifest_filename)
+        for tile in manifest["tiles"]:
+            self.asset_index.add(tile["filename"])
+        self.asset_index.add(manifest["link_map"])
+
+    def get_document(self, manifest_filename: str) -> Union[Document, None]:
+        """
+        :return: The links of a captured page, with a page for each of its tiles, or None if the capture is not found
+        """
+        if not self.asset_index.discover(manifest_filename):
+            logging.error(f"Image manifest not found: {manifest_filename}")
+            return None
+        self.asset_index.touch(manifest_filename)
+
+        document = self.document_collection.get_document_by_filename(manifest_filename)
+        if document:
+            return document
+
+        manifest_path = os.path.join(self.storage_dir, manifest_filename)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            with open(os.path.join(self.storage_dir, manifest["link_map"])) as f:
+                links = json.load(f)["links"]
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Error loading the link map of {manifest_filename}: {e}")
+            return None
+
+        regions = [(tile["x"], tile["y"], tile["width"], tile["height"]) for tile in manifest["tiles"]]
+        document = Document.from_regions(manifest_path, regions, links)
+        self.document_collection.add(document)
+        return document
+
+    def click(self, normalized_x: float, normalized_y: float, tile_index: int, manifest_filename: str) -> Union[str, None]:
+        """
+        :return: URL which can be accessed by clicking at the given coordinates of a tile, or None if no URL is found
+        """
+        document = self.get_document(manifest_filename)
+        if not document:
+            return None
+
+        url = document.get_url_at_position(normalized_x, normalized_y, normalized_coordinates=True, page_index=tile_index)
+        if url:
+            logging.info(f"Found a URL at position ({normalized_x}, {normalized_y}) on tile {tile_index} of {manifest_filename}: {url}")
+        else:
+            logging.info(f"No URL found at position ({normalized_x}, {normalized_y}) on tile {tile_index} of {manifest_filename}")
+        return url
 
-    def print_clickable_elements(self, driver):
-        clickable_elements = driver.find_elements(By.TAG_NAME, "a")
-        for element in clickable_elements:
-            if not element.get_attribute('onclick'):
-                if element.size['width'] > 0 and element.size['height'] > 0 and element.location['x'] > 0 and element.location['y'] > 0:
-                    print(f"Tag: {element.tag_name}, x={element.location['x']}, y={element.location['y']}, "
-                          f"width={element.size['width']}, height={element.size['height']}, "
-                          f"href={element.get_attribute('href')}")
+    def capture_tile(self, driver, render_options: RenderOptions, y: int, width: int, height: int, output_file_path: str):
+        parameters = {
+            'format': render_options.image_format,
+            'clip': {'x': 0, 'y': y, 'width': width, 'height': height, 'scale': 1},
+            # Renders the clipped region even where it is outside the viewport, without resizing the window
+            'captureBeyondViewport': True,
+        }
+        if render_options.image_format != 'png':
+            parameters['quality'] = render_options.image_quality
+        result = driver.execute_cdp_cmd('Page.captureScreenshot', parameters)
+
+        # Written to a temporary file which is renamed once complete, so a partial tile is never served
+        temporary_file_path = f"{output_file_path}{AssetIndex.PARTIAL_SUFFIX}"
+        try:
+            with open(temporary_file_path, "wb") as f:
+                f.write(base64.b64decode(result['data']))
+            os.replace(temporary_file_path, output_file_path)
+        finally:
+            if os.path.exists(temporary_file_path):
+                os.remove(temporary_file_path)
 
-    def convert_webpage(self, driver, url: str = None) -> (str, int):
+    def convert_webpage(self, driver, url: str = None, render_options: RenderOptions = None,
+                        cdp_event_monitor: CdpEventMonitor = None, stage_timer: StageTimer = None) -> (str, int):
+        """
+        :param stage_timer: Receives how long each stage of the conversion took
+        :return: (filename of the manifest, status code)
+        """
+        written_file_paths = []
         try:
+            if render_options is None:
+                render_options = RenderOptions()
+            if stage_timer is None:
+                stage_timer = StageTimer()
+            readiness_mode = render_options.readiness_mode
+            # Lay the page out for a desktop window at 1 device pixel per CSS pixel, so tiles are as big as their clips
+            driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+                "width": IMAGE_DEFAULT_WINDOW_WIDTH,
+                "height": IMAGE_DEFAULT_WINDOW_HEIGHT,
+                "deviceScaleFactor": 1,
+                "mobile": False
+            })
             if url:
-                # Reset window size to a default value before resizing according to content
-                driver.set_window_size(IMAGE_DEFAULT_WINDOW_WIDTH, IMAGE_DEFAULT_WINDOW_HEIGHT)  # Default window size
-                logging.info(f"Window size reset to default {IMAGE_DEFAULT_WINDOW_WIDTH}x{IMAGE_DEFAULT_WINDOW_HEIGHT} because a URL was provided.")
-                driver.get(url)
+                with stage_timer.stage("navigate"):
+                    if cdp_event_monitor:
+                        cdp_event_monitor.reset()
+                    driver.get(url)
             else:
                 logging.info("No URL provided. Using the current URL in the WebDriver.")
                 url = driver.current_url
+                # The navigation happened before this call, so its events were not tracked from the start
+                readiness_mode = CdpEventMonitor.READYSTATE
 
-            status_code = self.get_http_status_code(driver)
+            with stage_timer.stage("status"):
+                status_code = self.get_navigation_status_code(driver, cdp_event_monitor)
 
             logging.info(f"Accessed webpage '{url}' successfully, with HTTP status code {status_code}.")
-            await_webpage_load_result = self.await_webpage_load(driver, self.webpage_load_seconds)
+            with stage_timer.stage("readiness"):
+                await_webpage_load_result = self.await_webpage_readiness(driver, cdp_event_monitor, readiness_mode,
+                                                                         self.webpage_load_seconds)
 
             if not await_webpage_load_result:
-                logging.warning(f"Webpage '{url}' did not reach readyState within {self.webpage_load_seconds} seconds.")
+                logging.warning(f"Webpage '{url}' was not ready within {self.webpage_load_seconds} seconds.")
+
+            with stage_timer.stage("layout"):
+                width, content_height = self.get_page_size(driver)
+                height = min(content_height, self.max_height)
+                if content_height > height:
+                    logging.warning(f"Webpage '{url}' is {content_height} pixels tall, so only the first {height} pixels are captured.")
+
+            with stage_timer.stage("links"):
+                links = [link for link in driver.execute_script(ImageConverter.GET_LINKS_SCRIPT) or [] if link[1] < height]
+
+            hashed_url = self.hash_url(render_options.get_image_cache_key(url))
+
+            with stage_timer.stage("prune"):
+                self.prune_old_assets(asset_index=self.asset_index,
+                                      encoded_url=hashed_url,
+                                      extension=ImageConverter.MANIFEST_EXTENSION,
+                                      prune_seconds=self.duplicate_image_prune_seconds)
+
+            safe_filename = f"{hashed_url}_{int(time.time())}{ImageConverter.MANIFEST_EXTENSION}"
+            extension = RenderOptions.IMAGE_FORMATS[render_options.image_format]
+            tiles = []
+            with stage_timer.stage("screenshot"):
+                for tile_index, tile_y in enumerate(range(0, max(height, 1), self.tile_height)):
+                    tile_height = max(1, min(self.tile_height, height - tile_y))
+                    tile_filename = AssetIndex.get_sidecar_filename(safe_filename, f"tile-{tile_index}{extension}")
+                    tile_file_path = os.path.join(self.storage_dir, tile_filename)
+                    written_file_paths.append(tile_file_path)
+                    self.capture_tile(driver, render_options, tile_y, width, tile_height, tile_file_path)
+                    tiles.append({"filename": tile_filename, "x": 0, "y": tile_y, "width": width, "height": tile_height})
+
+            link_map_filename = AssetIndex.get_sidecar_filename(safe_filename, ImageConverter.LINK_MAP_SUFFIX)
+            manifest = {
+                "url": url,
+                "status_code": status_code,
+                "format": render_options.image_format,
+                "width": width,
+                "height": height,
+                "content_height": content_height,
+                "tile_height": self.tile_height,
+                "tiles": tiles,
+                "link_map": link_map_filename,
+            }
+            with stage_timer.stage("write"):
+                link_map_file_path = os.path.join(self.storage_dir, link_map_filename)
+                written_file_paths.append(link_map_file_path)
+                with open(link_map_file_path, "w") as f:
+                    # [x, y, width, height, url] of each link, in CSS pixels from the top left of the page
+                    json.dump({"links": links}, f)
+                with open(os.path.join(self.storage_dir, safe_filename), "w") as f:
+                    json.dump(manifest, f)
+            self.index_manifest(safe_filename)
+            written_file_paths = []
+
+            logging.info(f"Image manifest created with {len(tiles)} tiles and {len(links)} links: "
+                         f"{os.path.abspath(os.path.join(self.storage_dir, safe_filename))}")
 
-            # Determine the height of the webpage
-            #total_height = driver.execute_script("return document.body.parentNode.scrollHeight")
-            total_height = driver.execute_script("return document.documentElement.scrollHeight")
+            return safe_filename, status_code
+        except Exception as e:
+            logging.error(f"Error converting URL to image: {e}")
+            for written_file_path in written_file_paths:
+                if os.path.exists(written_file_path):
+                    os.remove(written_file_path)
+            return None, None
+        finally:
+            try:
+                # The driver is shared with PDF conversions, which expect the default emulated screen
+                driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', WebDriverManager.DEVICE_METRICS_OVERRIDE)
+            except Exception as e:
+                logging.warning(f"Error restoring the device metrics override: {e}")
 
-            # Resize window to the full height of the webpage to capture all content
-            driver.set_window_size(IMAGE_DEFAULT_WINDOW_WIDTH, total_height)
-            logging.info(f"Resized window to {IMAGE_DEFAULT_WINDOW_WIDTH}x{total_height}")
-            driver.execute_script("window.scrollTo(0, 0)")
 
-            # Use a hash of the URL to keep the filename short and manageable
-            hashed_url = hashlib.md5(url.encode('utf-8')).hexdigest()
+def rasterize_pdf_page(pdf_path: str, page_index: int, scale: float) -> bytes:
+    """
+    Runs in a PageRasterizer process.
+    :return: The page rendered as a PNG, at scale times 72 DPI
+    """
+    with fitz.open(pdf_path) as document:
+        pixmap = document.load_page(page_index).get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return pixmap.tobytes("png")
 
-            self.prune_old_assets(storage_dir=self.storage_dir,
-                                  encoded_url=hashed_url,
-                                  extension='.png',
-                                  prune_seconds=self.duplicate_image_prune_seconds)
 
-            safe_filename = f"{hashed_url}_{int(time.time())}.png"
-            output_filename = os.path.join(self.storage_dir, safe_filename)
+def optimize_pdf(pdf_path: str, image_dpi: int, image_quality: int) -> (int, int):
+    """
+    Runs in a PDFOptimizer process. Rewrites the PDF in place, if that makes it smaller.
+    :param image_dpi: Images with a noticeably higher resolution are downsampled to this DPI. 0 keeps their resolution.
+    :param image_quality: JPEG quality from 0 to 100 of downsampled images
+    :return: (size before, size after) in bytes
+    """
+    size_before = os.path.getsize(pdf_path)
+    temporary_path = f"{pdf_path}.optimized{AssetIndex.PARTIAL_SUFFIX}"
+    try:
+        with fitz.open(pdf_path) as document:
+            if image_dpi > 0:
+                document.rewrite_images(dpi_threshold=math.ceil(image_dpi * 1.25), dpi_target=image_dpi, quality=image_quality)
+            # Drops unused and duplicate objects, and compresses every stream
+            document.save(temporary_path, garbage=4, clean=True, deflate=True, deflate_images=True, deflate_fonts=True,
+                          use_objstms=1)
+        size_after = os.path.getsize(temporary_path)
+        if size_after >= size_before:
+            return size_before, size_before
+
+        # Keep the modification time, which the render cache uses as the time of the render
+        stat = os.stat(pdf_path)
+        os.utime(temporary_path, (stat.st_atime, stat.st_mtime))
+        os.replace(temporary_path, pdf_path)
+        return size_before, size_after
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+class PDFOptimizer:
+    """
+    Shrinks rendered PDFs in the background with PyMuPDF, by removing unused objects, compressing streams and
+    downsampling images. It runs in a process pool after the conversion has responded, so it adds no latency to
+    requests, and the first download of a PDF may still get the unoptimized file.
+    """
+    def __init__(self, asset_index: AssetIndex, storage_dir: str, process_count: int, image_dpi: int, image_quality: int):
+        self.asset_index = asset_index
+        self.storage_dir = storage_dir
+        self.process_count = max(1, process_count)
+        self.image_dpi = image_dpi
+        self.image_quality = image_quality
+        self.lock = threading.Lock()
+        # Started on the first optimization, so processes that never optimize a PDF don't start the pool
+        self.executor: Union[ProcessPoolExecutor, None] = None
+
+    def submit(self, pdf_filename: str):
+        with self.lock:
+            if self.executor is None:
+                # spawn, because forking a process that already runs threads is unsafe
+                self.executor = ProcessPoolExecutor(max_workers=self.process_count,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+            executor = self.executor
+        start_time = time.perf_counter()
+        try:
+            future = executor.submit(optimize_pdf, os.path.join(self.storage_dir, pdf_filename), self.image_dpi, self.image_quality)
+        except BrokenProcessPool as e:
+            self.on_broken_pool(executor, pdf_filename, e)
+            return
+        future.add_done_callback(lambda done_future: self.record(pdf_filename, done_future, executor, start_time))
+
+    def on_broken_pool(self, executor: ProcessPoolExecutor, pdf_filename: str, error: Exception):
+        # A process crashed, e.g. on a malformed PDF. The pool can't be used anymore, so the next PDF starts a new one.
+        logging.error(f"Error optimizing {pdf_filename}: {error}")
+        PDF_OPTIMIZATIONS.inc(result="failed")
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+
+    def record(self, pdf_filename: str, future, executor: ProcessPoolExecutor, start_time: float):
+        try:
+            size_before, size_after = future.result()
+        except BrokenProcessPool as e:
+            self.on_broken_pool(executor, pdf_filename, e)
+            return
+        except Exception as e:
+            # e.g. the PDF was deleted before it was optimized
+            logging.error(f"Error optimizing {pdf_filename}: {e}")
+            PDF_OPTIMIZATIONS.inc(result="failed")
+            return
+        PDF_OPTIMIZATION_SECONDS.observe(time.perf_counter() - start_time)
+        PDF_OPTIMIZATION_BYTES.inc(size_before, size="before")
+        PDF_OPTIMIZATION_BYTES.inc(size_after, size="after")
+        if size_after >= size_before:
+            PDF_OPTIMIZATIONS.inc(result="unchanged")
+            logging.info(f"Optimizing {pdf_filename} did not make it smaller than {size_before} bytes.")
+            return
+
+        PDF_OPTIMIZATIONS.inc(result="smaller")
+        logging.info(f"Optimized {pdf_filename} from {size_before} to {size_after} bytes "
+                     f"({round(100 * (1 - size_after / size_before), 1)}% smaller).")
+        if self.asset_index.contains(pdf_filename):
+            # Updates the size the retention quota counts
+            self.asset_index.add(pdf_filename)
+        else:
+            # Deleted while it was being optimized, and written back by the optimization
+            try:
+                os.remove(os.path.join(self.storage_dir, pdf_filename))
+            except FileNotFoundError:
+                pass
 
-            driver.save_screenshot(output_filename)
 
-            logging.info(f"Image file created: {os.path.abspath(output_filename)}")
+class PageRasterizer:
+    """
+    Renders single pages of stored PDFs as PNG images when they are first requested.
+    Rendering runs in a process pool, so it uses every core instead of contending for the GIL with request handling.
+    Rendered pages are kept as sidecar files of their PDF, so they are deleted along with it,
+    and the most recently used ones are also kept in memory up to a byte limit.
+    """
+    def __init__(self, pdf_converter: 'PDFConverter', process_count: int, memory_cache_max_bytes: int):
+        self.pdf_converter = pdf_converter
+        self.process_count = max(1, process_count)
+        self.memory_cache_max_bytes = memory_cache_max_bytes
+        self.lock = threading.Lock()
+        # A dict of image filename to PNG, ordered from least to most recently used
+        self.memory_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_cache_bytes = 0
+        self.single_flight = SingleFlight()
+        # Started on the first render, so processes that never serve page images don't start the pool
+        self.executor: Union[ProcessPoolExecutor, None] = None
 
-            #self.print_clickable_elements(driver)
+    @staticmethod
+    def get_image_filename(pdf_filename: str, page_index: int, scale: float) -> str:
+        return AssetIndex.get_sidecar_filename(pdf_filename, f"page-{page_index}@{scale:g}x.png")
 
-            return safe_filename, status_code
-        except Exception as e:
-            logging.error(f"Error converting URL to image: {e}")
-            return None, None
+    def get_page_image(self, pdf_filename: str, page_index: int, scale: float) -> Union[bytes, None]:
+        """
+        :param page_index: Index of the page, starting at 0
+        :param scale: Zoom factor, where 1 renders the page at 72 DPI
+        :return: The page as a PNG, or None if the PDF file is not found
+        :raises IndexError: If the PDF has no page at page_index
+        """
+        asset_index = self.pdf_converter.asset_index
+        if not asset_index.discover(pdf_filename):
+            logging.error(f"PDF file not found: {pdf_filename}")
+            return None
+        asset_index.touch(pdf_filename)
+
+        image_filename = self.get_image_filename(pdf_filename, page_index, scale)
+        with self.lock:
+            image = self.memory_cache.get(image_filename)
+            if image is not None:
+                self.memory_cache.move_to_end(image_filename)
+        if image is not None:
+            PAGE_IMAGE_LOOKUPS.inc(result="memory")
+            return image
+
+        # Concurrent requests for the same page share one render
+        return self.single_flight.do(image_filename, lambda: self.load_or_render(pdf_filename, page_index, scale, image_filename))
+
+    def load_or_render(self, pdf_filename: str, page_index: int, scale: float, image_filename: str) -> bytes:
+        asset_index = self.pdf_converter.asset_index
+        image_path = os.path.join(self.pdf_converter.storage_dir, image_filename)
+        if asset_index.contains(image_filename):
+            try:
+                with open(image_path, "rb") as f:
+                    image = f.read()
+                PAGE_IMAGE_LOOKUPS.inc(result="disk")
+                asset_index.touch(image_filename)
+                self.remember(image_filename, image)
+                return image
+            except FileNotFoundError:
+                # Deleted since the lookup; render it again
+                pass
+
+        # The page count comes from the parsed document, which clicks on the PDF usually have loaded already
+        document = self.pdf_converter.get_document(pdf_filename)
+        if document is None or not 0 <= page_index < len(document.pages):
+            raise IndexError(f"{pdf_filename} has no page {page_index}.")
+
+        start_time = time.perf_counter()
+        image = self.render(os.path.join(self.pdf_converter.storage_dir, pdf_filename), page_index, scale)
+        PAGE_IMAGE_RENDER_SECONDS.observe(time.perf_counter() - start_time)
+        PAGE_IMAGE_LOOKUPS.inc(result="render")
+
+        # Concurrent renders at other scales write other files, but each writes its own temporary file to be safe
+        temporary_path = f"{image_path}.{threading.get_ident()}{AssetIndex.PARTIAL_SUFFIX}"
+        try:
+            with open(temporary_path, "wb") as f:
+                f.write(image)
+            os.replace(temporary_path, image_path)
+            asset_index.add(image_filename)
+        except OSError as e:
+            logging.error(f"Error caching the image of page {page_index} of {pdf_filename}: {e}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        self.remember(image_filename, image)
+        return image
+
+    def render(self, pdf_path: str, page_index: int, scale: float) -> bytes:
+        with self.lock:
+            if self.executor is None:
+                # spawn, because forking a process that already runs threads is unsafe
+                self.executor = ProcessPoolExecutor(max_workers=self.process_count,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+            executor = self.executor
+        try:
+            return executor.submit(rasterize_pdf_page, pdf_path, page_index, scale).result()
+        except BrokenProcessPool:
+            # A process crashed, e.g. on a malformed PDF. The pool can't be used anymore, so the next render starts a new one.
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = None
+            raise
+
+    def remember(self, image_filename: str, image: bytes):
+        with self.lock:
+            if image_filename in self.memory_cache:
+                self.memory_cache_bytes -= len(self.memory_cache.pop(image_filename))
+            self.memory_cache[image_filename] = image
+            self.memory_cache_bytes += len(image)
+            while self.memory_cache and self.memory_cache_bytes > self.memory_cache_max_bytes:
+                _, evicted_image = self.memory_cache.popitem(last=False)
+                self.memory_cache_bytes -= len(evicted_image)
+
+    def forget(self, filename: str):
+        """
+        Drop the images of a deleted PDF, or a deleted image, from memory.
+        """
+        with self.lock:
+            for image_filename in [image_filename for image_filename in self.memory_cache
+                                   if image_filename == filename or AssetIndex.get_sidecar_parent(image_filename) == filename]:
+                self.memory_cache_bytes -= len(self.memory_cache.pop(image_filename))
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {"images_in_memory": len(self.memory_cache), "memory_bytes": self.memory_cache_bytes}
 
 
 def is_valid_url(url: str) -> bool:
@@ -408,8 +2679,324 @@ def is_valid_url(url: str) -> bool:
         # " " not in url,  # Ensures the URL does not contain spaces
     ])
 
+class RenderResult:
+    """
+    The outcome of rendering a URL to PDF or images. Instances are sent between processes, so they only hold plain data.
+    """
+    def __init__(self, safe_filename: Union[str, None], status_code: Union[int, None], navigation: NavigationRecord = None,
+                 blocked_requests_by_type: Dict[str, int] = None, transferred_requests: int = 0, transferred_bytes: int = 0,
+                 stage_seconds: Dict[str, float] = None):
+        self.safe_filename = safe_filename
+        self.status_code = status_code
+        self.navigation = navigation or NavigationRecord()
+        self.blocked_requests_by_type = blocked_requests_by_type or {}
+        self.transferred_requests = transferred_requests
+        self.transferred_bytes = transferred_bytes
+        self.stage_seconds = stage_seconds or {}
+
+
+def render_with_pool(web_driver_pool: WebDriverPool, converter: Converter, url: str,
+                     render_options: RenderOptions) -> RenderResult:
+    """
+    :param converter: Converter that renders the URL with a driver leased from the pool, e.g. to PDF or to images
+    :raises WebDriverPoolExhausted: If no driver became available to render the URL
+    """
+    stage_timer = StageTimer()
+    lease_start_time = time.perf_counter()
+    with web_driver_pool.lease() as web_driver_manager:
+        stage_timer.add("lease_wait", time.perf_counter() - lease_start_time)
+        web_driver_manager.apply_blocking_profile(render_options.blocking_profile)
+        cdp_event_monitor = web_driver_manager.cdp_event_monitor
+        safe_filename, status_code = converter.convert_webpage(web_driver_manager.driver, url,
+                                                               render_options=render_options,
+                                                               cdp_event_monitor=cdp_event_monitor,
+                                                               stage_timer=stage_timer)
+        web_driver_pool.record_render(web_driver_manager, succeeded=bool(safe_filename))
+        if not safe_filename:
+            return RenderResult(safe_filename, status_code, stage_seconds=stage_timer.stage_seconds)
+        if not cdp_event_monitor:
+            return RenderResult(safe_filename, status_code, stage_seconds=stage_timer.stage_seconds)
+        return RenderResult(safe_filename, status_code,
+                            navigation=cdp_event_monitor.navigation,
+                            blocked_requests_by_type=dict(cdp_event_monitor.blocked_requests_by_type),
+                            transferred_requests=cdp_event_monitor.transferred_requests,
+                            transferred_bytes=cdp_event_monitor.transferred_bytes,
+                            stage_seconds=stage_timer.stage_seconds)
+
+
+def run_render_worker(request_queue: multiprocessing.Queue, response_connection):
+    """
+    Entry point of a render worker process. It owns the Chrome drivers, and renders the requests it takes from
+    request_queue, sending a response for each over response_connection.
+    """
+    # Ctrl+C reaches the whole process group; the API process asks this process to shut down through request_queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    web_driver_pool = WebDriverPool(size=PDF_WEBDRIVER_POOL_SIZE,
+                                    webpage_timeout_seconds=WEBPAGE_TIMEOUT_SECONDS,
+                                    lease_timeout_seconds=WEBDRIVER_LEASE_TIMEOUT_SECONDS,
+                                    max_renders=WEBDRIVER_MAX_RENDERS,
+                                    max_rss_bytes=WEBDRIVER_MAX_RSS_BYTES,
+                                    max_consecutive_failures=WEBDRIVER_MAX_CONSECUTIVE_FAILURES,
+                                    health_check_interval_seconds=WEBDRIVER_HEALTH_CHECK_INTERVAL_SECONDS,
+                                    health_check_timeout_seconds=WEBDRIVER_HEALTH_CHECK_TIMEOUT_SECONDS,
+                                    spare=WEBDRIVER_SPARE,
+                                    warm_up_in_background=WEBDRIVER_WARM_UP_IN_BACKGROUND)
+    pdf_converter = PDFConverter(storage_dir=PDF_STORAGE_DIR,
+                                 webpage_load_seconds=WEBPAGE_LOAD_SECONDS,
+                                 duplicate_pdf_prune_seconds=DUPLICATE_PDF_PRUNE_SECONDS,
+                                 # The API process answers clicks, loading the links it needs from the PDF files
+                                 document_cache_max_entries=1,
+                                 stream_pdf_output=STREAM_PDF_OUTPUT,
+                                 pdf_stream_chunk_bytes=PDF_STREAM_CHUNK_BYTES,
+                                 extract_links=False,
+                                 # The API process cleaned up at startup, and the other processes may be writing now
+                                 remove_partial_files=False)
+    image_converter = ImageConverter(storage_dir=IMAGE_STORAGE_DIR,
+                                     webpage_load_seconds=WEBPAGE_LOAD_SECONDS,
+                                     duplicate_image_prune_seconds=DUPLICATE_IMAGE_PRUNE_SECONDS,
+                                     document_cache_max_entries=1,
+                                     remove_partial_files=False)
+    converters = {'pdf': pdf_converter, 'image': image_converter}
+    executor = ThreadPoolExecutor(max_workers=web_driver_pool.size, thread_name_prefix="RenderWorker")
+    response_lock = threading.Lock()
+
+    def respond(response: dict):
+        with response_lock:
+            response_connection.send(response)
+
+    def handle(render_request: dict):
+        try:
+            render_options = RenderOptions(readiness_mode=render_request['readiness_mode'],
+                                           blocking_profile=render_request['blocking_profile'],
+                                           image_format=render_request['image_format'],
+                                           image_quality=render_request['image_quality'])
+            result = render_with_pool(web_driver_pool, converters[render_request['converter']],
+                                      render_request['url'], render_options)
+            # The API process reports the drivers of every worker process in its stats and metrics
+            respond({'id': render_request['id'], 'result': result, 'driver_stats': web_driver_pool.get_stats()})
+        except WebDriverPoolExhausted as e:
+            respond({'id': render_request['id'], 'error': str(e), 'busy': True})
+        except Exception as e:
+            logging.error(f"Error rendering {render_request['url']} in render worker: {e}")
+            respond({'id': render_request['id'], 'error': str(e)})
+
+    def report_warm_up():
+        # Lets the API process answer readiness checks while this process starts its drivers
+        last_state = None
+        while True:
+            state = web_driver_pool.get_warm_up_state()
+            if state != last_state:
+                respond({'id': None, 'warm_up': state})
+                last_state = state
+            if web_driver_pool.warm_up_done.wait(0.5) and state["state"] != "warming_up":
+                break
+
+    threading.Thread(target=report_warm_up, name="RenderWorkerWarmUp", daemon=True).start()
+
+    logging.info(f"Render worker process {os.getpid()} is accepting requests.")
+    while True:
+        render_request = request_queue.get()
+        if render_request is None:
+            break
+        executor.submit(handle, render_request)
+    logging.info(f"Render worker process {os.getpid()} is shutting down.")
+    web_driver_pool.stop()
+
+
+class RenderWorkerProcess:
+    def __init__(self, context, index: int):
+        self.index = index
+        # Every process gets its own queue and pipe, so a crash can't leave a lock held that other processes need
+        self.request_queue = context.Queue()
+        self.response_connection, child_response_connection = context.Pipe(duplex=False)
+        self.process = context.Process(target=run_render_worker,
+                                       args=(self.request_queue, child_response_connection),
+                                       name=f"RenderWorker-{index}", daemon=True)
+        self.process.start()
+        child_response_connection.close()
+        self.start_time = time.time()
+        # When the dispatcher noticed that the process exited, or None while it runs
+        self.exit_time: Union[float, None] = None
+        # IDs of requests sent to this process that have no response yet
+        self.pending_request_ids = set()
+        self.warm_up_state = {"state": "warming_up", "ready": 0, "size": PDF_WEBDRIVER_POOL_SIZE, "failures": 0}
+        # The pool stats sent with the most recent response
+        self.driver_stats: List[dict] = []
+        logging.info(f"Started render worker process {self.process.pid}.")
+
+
+class RenderWorkerClient:
+    """
+    Sends render requests to dedicated render worker processes over local queues.
+    Request handling never shares a process with Chrome, so a crashed browser or worker can't take down the API.
+    Worker processes that exit are restarted, and the requests they were rendering fail right away.
+    """
+    # A worker process that exits within this many seconds of starting is restarted this long after it exited,
+    # so a worker that can't start doesn't restart in a tight loop
+    RESTART_DELAY_SECONDS = 5
+
+    def __init__(self, process_count: int, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        # spawn, because forking a process that already runs threads is unsafe
+        self.context = multiprocessing.get_context('spawn')
+        self.lock = threading.Lock()
+        # A dict of request id to the Event set when its response arrives, and the response
+        self.pending: Dict[str, Tuple[threading.Event, dict]] = {}
+        self.restarts = 0
+        self.stopped = False
+        self.workers = [RenderWorkerProcess(self.context, i) for i in range(max(1, process_count))]
+        self.dispatcher = threading.Thread(target=self._dispatch, name="RenderWorkerDispatcher", daemon=True)
+        self.dispatcher.start()
+
+    def _resolve(self, request_id: str, response: dict):
+        with self.lock:
+            pending = self.pending.get(request_id)
+        if pending:
+            pending[1].update(response)
+            pending[0].set()
+
+    def _dispatch(self):
+        while True:
+            workers = list(self.workers)
+            # Exited processes are left out, since their sentinel and closed pipe would wake the wait right away
+            connections = {worker.response_connection: worker for worker in workers if worker.exit_time is None}
+            wait_objects = list(connections) + [worker.process.sentinel for worker in connections.values()]
+            # Wakes up when a response arrives, a worker process exits, or an exited worker is due to restart
+            timeout = min([1] + [max(0, self._get_restart_time(worker) - time.time())
+                                 for worker in workers if worker.exit_time is not None])
+            if wait_objects:
+                multiprocessing.connection.wait(wait_objects, timeout=timeout)
+            else:
+                time.sleep(timeout)
+
+            for connection, worker in connections.items():
+                try:
+                    while connection.poll():
+                        response = connection.recv()
+                        if 'warm_up' in response:
+                            worker.warm_up_state = response['warm_up']
+                            continue
+                        if 'driver_stats' in response:
+                            worker.driver_stats = response['driver_stats']
+                        with self.lock:
+                            worker.pending_request_ids.discard(response['id'])
+                        self._resolve(response['id'], response)
+                except (EOFError, OSError):
+                    # The process exited, which is handled below
+                    pass
+
+            if self.stopped:
+                return
+            for worker in workers:
+                if worker.exit_time is None:
+                    if worker.process.is_alive():
+                        continue
+                    worker.exit_time = time.time()
+                    logging.error(f"Render worker process {worker.process.pid} exited with code {worker.process.exitcode}. "
+                                  f"Restarting it in {round(self._get_restart_time(worker) - worker.exit_time, 1)} seconds.")
+                    self._fail_pending_requests(worker)
+                if time.time() < self._get_restart_time(worker):
+                    continue
+                with self.lock:
+                    self.workers[worker.index] = RenderWorkerProcess(self.context, worker.index)
+                    self.restarts += 1
+                # Requests sent to the exited process while it waited to be restarted
+                self._fail_pending_requests(worker)
+
+    @staticmethod
+    def _get_restart_time(worker: RenderWorkerProcess) -> float:
+        if worker.exit_time - worker.start_time < RenderWorkerClient.RESTART_DELAY_SECONDS:
+            return worker.exit_time + RenderWorkerClient.RESTART_DELAY_SECONDS
+        return worker.exit_time
+
+    def _fail_pending_requests(self, worker: RenderWorkerProcess):
+        with self.lock:
+            failed_request_ids = list(worker.pending_request_ids)
+            worker.pending_request_ids.clear()
+        for request_id in failed_request_ids:
+            self._resolve(request_id, {'id': request_id, 'error': "The render worker process exited."})
+
+    def render(self, url: str, render_options: RenderOptions, converter: str = 'pdf') -> RenderResult:
+        """
+        :param converter: 'pdf' or 'image'
+        :raises WebDriverPoolExhausted: If no render worker could render the URL in time
+        """
+        request_id = uuid.uuid4().hex
+        done = threading.Event()
+        response = {}
+        with self.lock:
+            self.pending[request_id] = (done, response)
+            # Send the request to the live worker with the fewest requests in progress
+            worker = min(self.workers, key=lambda w: (not w.process.is_alive(), len(w.pending_request_ids)))
+            worker.pending_request_ids.add(request_id)
+        try:
+            worker.request_queue.put({'id': request_id,
+                                      'converter': converter,
+                                      'url': url,
+                                      'readiness_mode': render_options.readiness_mode,
+                                      'blocking_profile': render_options.blocking_profile.name,
+                                      'image_format': render_options.image_format,
+                                      'image_quality': render_options.image_quality})
+            if not done.wait(self.timeout_seconds):
+                raise WebDriverPoolExhausted(f"No render worker responded within {self.timeout_seconds} seconds.")
+        finally:
+            with self.lock:
+                del self.pending[request_id]
+                worker.pending_request_ids.discard(request_id)
+
+        if response.get('busy'):
+            raise WebDriverPoolExhausted(response['error'])
+        if 'error' in response:
+            logging.error(f"Render worker failed to render {url}: {response['error']}")
+            return RenderResult(None, None)
+        return response['result']
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "processes": [{"pid": worker.process.pid,
+                               "alive": worker.process.is_alive(),
+                               "pending_requests": len(worker.pending_request_ids),
+                               "drivers": worker.driver_stats} for worker in self.workers],
+                "restarts": self.restarts,
+            }
+
+    def get_warm_up_state(self) -> dict:
+        with self.lock:
+            states = [dict(worker.warm_up_state, pid=worker.process.pid) for worker in self.workers]
+        ready_count = sum(state["ready"] for state in states)
+        if any(state["state"] == "warming_up" for state in states):
+            state = "warming_up"
+        elif ready_count == 0:
+            state = "failed"
+        else:
+            state = "ready"
+        return {"state": state,
+                "ready": ready_count,
+                "size": sum(state["size"] for state in states),
+                "failures": sum(state["failures"] for state in states),
+                "processes": states}
+
+    def stop(self, timeout_seconds: float = 10):
+        """
+        Ask every worker process to shut down its browsers and exit, without restarting it.
+        :param timeout_seconds: How long to wait for each process before terminating it
+        """
+        self.stopped = True
+        for worker in self.workers:
+            worker.request_queue.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout_seconds)
+            if worker.process.is_alive():
+                logging.warning(f"Render worker process {worker.process.pid} did not exit in time. Terminating it.")
+                worker.process.terminate()
+
+
 class FlaskWebApp:
-    def __init__(self, config_path: str = 'config.ini'):
+    def __init__(self, config_path: str = 'config.ini', production: bool = False):
+        """
+        :param production: Render in separate worker processes instead of this one
+        """
 
         if not os.path.exists(config_path):
             logging.error(f"{config_path} file not found. "
@@ -426,39 +3013,163 @@ class FlaskWebApp:
 
         self.image_converter = ImageConverter(storage_dir=IMAGE_STORAGE_DIR,
                                                 webpage_load_seconds=WEBPAGE_LOAD_SECONDS,
-                                                duplicate_image_prune_seconds=DUPLICATE_IMAGE_PRUNE_SECONDS)
+                                                duplicate_image_prune_seconds=DUPLICATE_IMAGE_PRUNE_SECONDS,
+                                                document_cache_max_entries=DOCUMENT_CACHE_MAX_ENTRIES,
+                                                document_cache_max_bytes=DOCUMENT_CACHE_MAX_BYTES)
         self.pdf_converter = PDFConverter(storage_dir=PDF_STORAGE_DIR,
                                             webpage_load_seconds=WEBPAGE_LOAD_SECONDS,
-                                            duplicate_pdf_prune_seconds=DUPLICATE_PDF_PRUNE_SECONDS)
+                                            duplicate_pdf_prune_seconds=DUPLICATE_PDF_PRUNE_SECONDS,
+                                            document_cache_max_entries=DOCUMENT_CACHE_MAX_ENTRIES,
+                                            document_cache_max_bytes=DOCUMENT_CACHE_MAX_BYTES,
+                                            stream_pdf_output=STREAM_PDF_OUTPUT,
+                                            pdf_stream_chunk_bytes=PDF_STREAM_CHUNK_BYTES)
+
+        self.pdf_optimizer = None
+        if PDF_OPTIMIZE:
+            self.pdf_optimizer = PDFOptimizer(asset_index=self.pdf_converter.asset_index,
+                                              storage_dir=PDF_STORAGE_DIR,
+                                              process_count=PDF_OPTIMIZE_PROCESSES,
+                                              image_dpi=PDF_OPTIMIZE_IMAGE_DPI,
+                                              image_quality=PDF_OPTIMIZE_IMAGE_QUALITY)
+        self.page_rasterizer = PageRasterizer(pdf_converter=self.pdf_converter,
+                                              process_count=PAGE_IMAGE_PROCESSES,
+                                              memory_cache_max_bytes=PAGE_IMAGE_MEMORY_CACHE_BYTES)
+
+        self.retention_worker = RetentionWorker(asset_indexes=[self.pdf_converter.asset_index,
+                                                               self.image_converter.asset_index],
+                                                interval_seconds=RETENTION_INTERVAL_SECONDS,
+                                                max_age_seconds=RETENTION_MAX_AGE_SECONDS,
+                                                max_total_bytes=RETENTION_MAX_TOTAL_BYTES,
+                                                on_remove=self.on_asset_removed)
+        self.retention_worker.start()
 
         self.setup_routes()
-        #self.image_web_driver_manager = WebDriverManager(webpage_timeout_seconds=WEBPAGE_TIMEOUT_SECONDS)
-        self.image_web_driver_manager = None
-        self.pdf_web_driver_manager = WebDriverManager(webpage_timeout_seconds=WEBPAGE_TIMEOUT_SECONDS)
+        self.image_single_flight = SingleFlight()
+        self.pdf_single_flight = SingleFlight()
+        self.pdf_render_cache = RenderCache(asset_index=self.pdf_converter.asset_index,
+                                            extension='.pdf',
+                                            revalidate=PDF_CACHE_REVALIDATE,
+                                            revalidate_timeout_seconds=PDF_CACHE_REVALIDATE_TIMEOUT_SECONDS,
+                                            cache_error_pages=PDF_CACHE_ERROR_PAGES)
+        # Image captures lease their drivers from the same pool as PDF renders
+        self.pdf_web_driver_pool = None
+        self.render_worker_client = None
+        if production:
+            # Long enough to wait for a free driver, then navigate, wait for the page, and print it
+            render_timeout_seconds = WEBDRIVER_LEASE_TIMEOUT_SECONDS + WEBPAGE_TIMEOUT_SECONDS + 2 * WEBPAGE_LOAD_SECONDS + 30
+            self.render_worker_client = RenderWorkerClient(process_count=RENDER_WORKER_PROCESSES,
+                                                           timeout_seconds=render_timeout_seconds)
+        else:
+            self.pdf_web_driver_pool = WebDriverPool(size=PDF_WEBDRIVER_POOL_SIZE,
+                                                     webpage_timeout_seconds=WEBPAGE_TIMEOUT_SECONDS,
+                                                     lease_timeout_seconds=WEBDRIVER_LEASE_TIMEOUT_SECONDS,
+                                                     max_renders=WEBDRIVER_MAX_RENDERS,
+                                                     max_rss_bytes=WEBDRIVER_MAX_RSS_BYTES,
+                                                     max_consecutive_failures=WEBDRIVER_MAX_CONSECUTIVE_FAILURES,
+                                                     health_check_interval_seconds=WEBDRIVER_HEALTH_CHECK_INTERVAL_SECONDS,
+                                                     health_check_timeout_seconds=WEBDRIVER_HEALTH_CHECK_TIMEOUT_SECONDS,
+                                                     spare=WEBDRIVER_SPARE,
+                                                     warm_up_in_background=WEBDRIVER_WARM_UP_IN_BACKGROUND)
+        job_worker_count = JOB_WORKERS
+        if job_worker_count <= 0:
+            # Every render worker process has its own pool of drivers
+            job_worker_count = PDF_WEBDRIVER_POOL_SIZE * (RENDER_WORKER_PROCESSES if production else 1)
+        self.pdf_job_queue = ConversionJobQueue(convert=self.get_pdf,
+                                                worker_count=job_worker_count,
+                                                max_size=JOB_QUEUE_MAX_SIZE,
+                                                result_ttl_seconds=JOB_RESULT_TTL_SECONDS)
         return
 
     def setup_routes(self):
         self.app.add_url_rule('/convert-to-image', 'convert_to_image', self.convert_to_image, methods=['GET'])
         self.app.add_url_rule('/convert-to-pdf', 'convert_to_pdf', self.convert_to_pdf, methods=['GET'])
+        self.app.add_url_rule('/convert-to-pdf-async', 'convert_to_pdf_async', self.convert_to_pdf_async, methods=['GET'])
+        self.app.add_url_rule('/jobs/<job_id>', 'get_job', self.get_job, methods=['GET'])
         self.app.add_url_rule('/images/<path:filename>', 'serve_image', self.serve_image, methods=['GET'])
+        self.app.add_url_rule('/pdfs/<filename>/pages/<int:page_index>.png', 'serve_pdf_page', self.serve_pdf_page, methods=['GET'])
         self.app.add_url_rule('/pdfs/<path:filename>', 'serve_pdf', self.serve_pdf, methods=['GET'])
         self.app.add_url_rule('/click-image', 'click_image', self.click_image, methods=['GET'])
         self.app.add_url_rule('/click-pdf', 'click_pdf', self.click_pdf, methods=['GET'])
+        self.app.add_url_rule('/click-pdf-batch', 'click_pdf_batch', self.click_pdf_batch, methods=['GET'])
+        self.app.add_url_rule('/link-map', 'link_map', self.link_map, methods=['GET'])
+        self.app.add_url_rule('/driver-stats', 'driver_stats', self.driver_stats, methods=['GET'])
+        self.app.add_url_rule('/blocking-profiles', 'blocking_profiles', self.blocking_profiles, methods=['GET'])
+        self.app.add_url_rule('/ready', 'ready', self.ready, methods=['GET'])
+        self.app.add_url_rule('/metrics', 'metrics', self.metrics, methods=['GET'])
 
     def run(self):
-        self.app.run(host=HOST, port=PORT)
+        # threaded=True lets requests use the other drivers in the pool while one is busy rendering
+        self.app.run(host=HOST, port=PORT, threaded=True)
+
+    def run_production(self):
+        # systemd stops the service with SIGTERM, which waitress only handles like Ctrl+C once it raises SystemExit
+        signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+        logging.info(f"Serving on {HOST}:{PORT} with {WSGI_THREADS} threads and {len(self.render_worker_client.workers)} render worker processes.")
+        try:
+            waitress.serve(self.app, host=HOST, port=PORT, threads=WSGI_THREADS)
+        finally:
+            self.render_worker_client.stop()
+
+    def on_asset_removed(self, asset_index: AssetIndex, filename: str):
+        if asset_index is self.pdf_converter.asset_index:
+            self.pdf_converter.document_collection.remove_document(filename)
+            self.page_rasterizer.forget(filename)
+        elif asset_index is self.image_converter.asset_index:
+            self.image_converter.document_collection.remove_document(filename)
+
+    def driver_stats(self):
+        if self.render_worker_client:
+            # The drivers live in the render worker processes
+            return jsonify(self.render_worker_client.get_stats())
+        return jsonify(self.pdf_web_driver_pool.get_stats())
+
+    def ready(self):
+        # The port opens before the drivers have started, so load balancers can use this to wait for the warm-up
+        if self.render_worker_client:
+            warm_up_state = self.render_worker_client.get_warm_up_state()
+        else:
+            warm_up_state = self.pdf_web_driver_pool.get_warm_up_state()
+        # At least one driver is enough to serve requests; the others keep starting in the background
+        return jsonify(warm_up_state), 200 if warm_up_state["ready"] > 0 else 503
+
+    def metrics(self):
+        # Gauges that mirror state kept elsewhere are refreshed on each scrape
+        JOB_QUEUE_DEPTH.set(self.pdf_job_queue.get_depth())
+
+        document_cache_stats = self.pdf_converter.document_collection.get_stats()
+        DOCUMENT_CACHE_HITS.set(document_cache_stats["hits"])
+        DOCUMENT_CACHE_MISSES.set(document_cache_stats["misses"])
+        DOCUMENT_CACHE_DOCUMENTS.set(document_cache_stats["documents"])
+        DOCUMENT_CACHE_BYTES.set(document_cache_stats["approximate_bytes"])
+
+        page_image_cache_stats = self.page_rasterizer.get_stats()
+        PAGE_IMAGE_CACHE_IMAGES.set(page_image_cache_stats["images_in_memory"])
+        PAGE_IMAGE_CACHE_BYTES.set(page_image_cache_stats["memory_bytes"])
+
+        if self.render_worker_client:
+            driver_stats_by_process = {process["pid"]: process["drivers"]
+                                       for process in self.render_worker_client.get_stats()["processes"]}
+        else:
+            driver_stats_by_process = {os.getpid(): self.pdf_web_driver_pool.get_stats()}
+        for gauge in (WEBDRIVER_LEASES, WEBDRIVER_BUSY_SECONDS, WEBDRIVER_BUSY, WEBDRIVER_RECYCLES):
+            gauge.clear()
+        for pid, driver_stats in driver_stats_by_process.items():
+            for stats in driver_stats:
+                WEBDRIVER_LEASES.set(stats["leases"], process=pid, driver=stats["index"])
+                WEBDRIVER_BUSY_SECONDS.set(stats["busy_seconds"], process=pid, driver=stats["index"])
+                WEBDRIVER_BUSY.set(int(stats["busy"]), process=pid, driver=stats["index"])
+                WEBDRIVER_RECYCLES.set(stats["recycles"], process=pid, driver=stats["index"])
+
+        return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+    def blocking_profiles(self):
+        return jsonify({name: blocking_profile.get_stats() for name, blocking_profile in BLOCKING_PROFILES.items()})
 
     def click_pdf(self):
         # Clicks at the provided x, y coordinates on the currently loaded PDF, if any
         x = request.args.get('x')
         y = request.args.get('y')
-        pdf_filename = request.args.get('pdf_filename')
-
-        if "/" in pdf_filename:
-            # Remove everything before and including the last slash
-            original_pdf_filename = pdf_filename
-            pdf_filename = pdf_filename.split("/")[-1]
-            logging.info(f"Extracted PDF filename from {original_pdf_filename}: {pdf_filename}")
+        pdf_filename = self.extract_filename(request.args.get('pdf_filename'))
 
         page_index = request.args.get('page_index')
         if not x or not y or not pdf_filename or not page_index:
@@ -474,41 +3185,97 @@ class FlaskWebApp:
 
         #url_accessed, safe_filename, status_code = self.pdf_converter.click(driver, x, y, page_index, pdf_filename)
 
+        start_time = time.perf_counter()
         url_at_position = self.pdf_converter.click(x, y, page_index, pdf_filename)
+        CLICK_LOOKUP_SECONDS.observe(time.perf_counter() - start_time, route="click_pdf")
 
         if url_at_position:
             return Response(url_at_position, mimetype='text/plain', status=200)
         else:
             return Response("", mimetype='text/plain', status=500)
 
+    def click_pdf_batch(self):
+        # Resolves many positions on one PDF in a single request.
+        # positions is a |-delimited list of page_index,x,y triples, e.g. positions=0,0.5,0.25|1,0.1,0.9
+        pdf_filename = self.extract_filename(request.args.get('pdf_filename'))
+        positions_argument = request.args.get('positions')
+        if not pdf_filename or not positions_argument:
+            return Response("Missing pdf_filename or positions", status=400)
 
-    def click_image(self):
-        # Don't use the function yet, not implemented
-        return Response("Not implemented", status=501)
+        positions = []
+        for position in positions_argument.split('|'):
+            try:
+                page_index, x, y = position.split(',')
+                page_index, x, y = int(page_index), float(x), float(y)
+            except ValueError:
+                return Response(f"Invalid position '{position}'. Expected page_index,x,y", status=400)
+            if x > 1 or y > 1 or x < 0 or y < 0:
+                return Response("x and y coordinates must be normalized between 0 and 1, where origin is at the top left.", status=400)
+            positions.append((page_index, x, y))
+
+        start_time = time.perf_counter()
+        urls = self.pdf_converter.click_many(positions, pdf_filename)
+        CLICK_LOOKUP_SECONDS.observe(time.perf_counter() - start_time, route="click_pdf_batch")
+        if urls is None:
+            return Response("File not found.", status=404)
+
+        # One line per position, in request order. Positions without a URL get an empty line.
+        return Response("\n".join(url or "" for url in urls), mimetype='text/plain', status=200)
+
+    def link_map(self):
+        # Returns every link of a PDF, so clients can hit-test locally instead of calling /click-pdf for each click.
+        # precision sets the digits after the decimal point of the dimensions; a negative precision doesn't round them.
+        pdf_filename = self.extract_filename(request.args.get('pdf_filename'))
+        if not pdf_filename:
+            return Response("Missing pdf_filename", status=400)
+
+        precision = request.args.get('precision', default=LINK_MAP_PRECISION, type=int)
+        if precision > 10:
+            return Response("precision must be at most 10", status=400)
+
+        link_map = self.pdf_converter.get_link_map(pdf_filename, precision if precision >= 0 else None)
+        if link_map is None:
+            return Response("File not found.", status=404)
+        return Response(link_map, mimetype='text/plain')
+
+    @staticmethod
+    def extract_filename(filename: str) -> str:
+        if filename and "/" in filename:
+            # Remove everything before and including the last slash
+            original_filename = filename
+            filename = filename.split("/")[-1]
+            logging.info(f"Extracted filename from {original_filename}: {filename}")
+        return filename
 
-        # Clicks at the provided x, y coordinates on the currently loaded webpage, if any
+
+    def click_image(self):
+        # Looks up the link at the provided x, y coordinates on a tile of a captured webpage, using the links saved
+        # when it was captured. image_filename is the manifest, and tile_index is the position of the tile in it.
         x = request.args.get('x')
         y = request.args.get('y')
-        if not x or not y:
-            return Response("Missing x or y coordinates", status=400)
-
-        x = int(x)
-        y = int(y)
-
-        click_executed = self.image_web_driver_manager.click_at_pixel(x, y)
-        if click_executed:
-            # We need to create a new image after the click, and return the URL
-            safe_filename, status_code = self.image_converter.convert_webpage(self.image_web_driver_manager.driver, url=None)
-            if safe_filename:
-                base_url = f"http://{DOMAIN}:{PORT}" if DOMAIN else request.host_url.rstrip('/')
-                image_url = f"{base_url}/images/{safe_filename}"
-                response_contents = f"{image_url}*{status_code}*"
-                return Response(response_contents, mimetype='text/plain')
-            else:
-                return Response("Click executed, but failed to convert webpage to image.", status=500, mimetype='text/plain')
-        else:
-            return Response("Click not executed.", status=400)
+        image_filename = self.extract_filename(request.args.get('image_filename'))
+        tile_index = request.args.get('tile_index', default='0')
+        if not x or not y or not image_filename:
+            return Response("Missing x, y, or image_filename", status=400)
+
+        try:
+            x = float(x)
+            y = float(y)
+            tile_index = int(tile_index)
+        except ValueError:
+            return Response("x and y must be numbers, and tile_index must be an integer.", status=400)
+
+        if x > 1 or y > 1 or x < 0 or y < 0:
+            return Response("x and y coordinates must be normalized between 0 and 1, where origin is at the top left.", status=400)
+
+        start_time = time.perf_counter()
+        url_at_position = self.image_converter.click(x, y, tile_index, image_filename)
+        CLICK_LOOKUP_SECONDS.observe(time.perf_counter() - start_time, route="click_image")
 
+        if url_at_position:
+            return Response(url_at_position, mimetype='text/plain', status=200)
+        else:
+            return Response("", mimetype='text/plain', status=500)
 
     def sanitize_url(self, url: str):
         url = url.strip()
@@ -541,44 +3308,216 @@ class FlaskWebApp:
             return Response("Missing URL", status=400)
 
         logging.info(f"Received request to convert URL to PDF: {url}")
+        start_time = time.perf_counter()
         url = self.sanitize_url(url)
+        CONVERSION_STAGE_SECONDS.observe(time.perf_counter() - start_time, converter="pdf", stage="sanitize")
         logging.info(f"Sanitized URL: {url}")
 
+        # max_age overrides the configured cache age for this request, and fresh=1 always renders again
+        max_age_seconds = request.args.get('max_age', default=PDF_CACHE_MAX_AGE_SECONDS, type=int)
+        fresh = request.args.get('fresh') == '1'
+        try:
+            render_options = self.get_render_options()
+        except ValueError as e:
+            return Response(str(e), status=400, mimetype='text/plain')
 
-        driver = self.pdf_web_driver_manager.driver
-
-        safe_filename, status_code = self.pdf_converter.convert_webpage(driver, url)
+        try:
+            safe_filename, status_code = self.get_pdf(url, max_age_seconds, fresh, render_options)
+        except WebDriverPoolExhausted as e:
+            logging.warning(f"Rejecting request to convert {url} to PDF: {e}")
+            return Response("All WebDrivers are busy. Please try again later.", status=503, mimetype='text/plain')
 
         if safe_filename:
-            base_url = f"http://{DOMAIN}:{PORT}" if DOMAIN else request.host_url.rstrip('/')
-            pdf_url = f"{base_url}/pdfs/{safe_filename}"
-            response_contents = f"{pdf_url}*{status_code}*"
+            response_contents = f"{self.get_file_url('pdfs', safe_filename)}*{status_code}*"
             return Response(response_contents, mimetype='text/plain')
         else:
             return Response("Failed to convert webpage to PDF.", status=500, mimetype='text/plain')
 
+    def convert_to_pdf_async(self):
+        # Queues the conversion and responds with a job ID right away. Poll /jobs/<job_id> for the result.
+        url = request.args.get('url')
+        if not url:
+            return Response("Missing URL", status=400)
+
+        logging.info(f"Received request to asynchronously convert URL to PDF: {url}")
+        url = self.sanitize_url(url)
 
-    def convert_to_image(self):
+        max_age_seconds = request.args.get('max_age', default=PDF_CACHE_MAX_AGE_SECONDS, type=int)
+        fresh = request.args.get('fresh') == '1'
+        # Jobs with a lower priority number run first. Clamped, so clients can't jump ahead of everyone else's jobs.
+        priority = min(max(request.args.get('priority', default=0, type=int), JOB_MIN_PRIORITY), JOB_MAX_PRIORITY)
+        try:
+            render_options = self.get_render_options()
+        except ValueError as e:
+            return Response(str(e), status=400, mimetype='text/plain')
 
-        # Don't use the function yet, not implemented
-        return Response("Not implemented", status=501)
+        try:
+            job = self.pdf_job_queue.submit(url, priority, max_age_seconds, fresh, render_options)
+        except ConversionJobQueueFull as e:
+            logging.warning(f"Rejecting request to convert {url} to PDF: {e}")
+            return Response("Too many queued conversions. Please try again later.", status=503, mimetype='text/plain')
+
+        return Response(job.id, mimetype='text/plain', status=202)
+
+    def get_job(self, job_id):
+        # wait=N long-polls for up to N seconds until the job finishes
+        job = self.pdf_job_queue.get_job(job_id)
+        if not job:
+            return Response("Job not found.", status=404, mimetype='text/plain')
+
+        wait_seconds = min(request.args.get('wait', default=0, type=float), JOB_MAX_WAIT_SECONDS)
+        if wait_seconds > 0:
+            job.done.wait(wait_seconds)
+
+        if job.state == ConversionJob.DONE:
+            response_contents = f"{self.get_file_url('pdfs', job.safe_filename)}*{job.status_code}*"
+            return Response(response_contents, mimetype='text/plain')
+        elif job.state == ConversionJob.FAILED:
+            return Response("Failed to convert webpage to PDF.", status=500, mimetype='text/plain')
+        else:
+            # Still pending, so respond with the state and the number of jobs ahead of it
+            response_contents = f"{job.state}*{self.pdf_job_queue.get_position(job)}*"
+            return Response(response_contents, mimetype='text/plain', status=202)
 
+    def get_pdf(self, url: str, max_age_seconds: int, fresh: bool, render_options: RenderOptions) -> (str, int):
+        """
+        :return: (safe_filename, status_code) of a cached render of the URL if allowed, otherwise of a new render
+        :raises WebDriverPoolExhausted: If no driver became available to render the URL
+        """
+        cache_key = render_options.get_cache_key(url)
+        if fresh:
+            RENDER_CACHE_LOOKUPS.inc(result="bypass")
+        else:
+            cached_render = self.pdf_render_cache.lookup(url, max_age_seconds, cache_key=cache_key)
+            RENDER_CACHE_LOOKUPS.inc(result="hit" if cached_render else "miss")
+            if cached_render:
+                return cached_render
+
+        rendered_by_this_request = []
+
+        def render():
+            rendered_by_this_request.append(True)
+            return self.render_pdf(url, render_options)
+
+        # Identical requests made while a render is in progress share that render's result
+        result = self.pdf_single_flight.do(cache_key, render)
+        if not rendered_by_this_request:
+            SHARED_RENDERS.inc()
+        return result
+
+    @staticmethod
+    def get_render_options(image: bool = False) -> RenderOptions:
+        """
+        :param image: Whether the request captures images, so its image encoding options apply
+        :raises ValueError: If the request has invalid render options
+        """
+        # ready selects how to detect that the page finished loading, e.g. ready=networkidle
+        # profile selects which requests to block while rendering, e.g. profile=ads
+        readiness_mode = request.args.get('ready', default=READINESS_MODE).lower()
+        blocking_profile = request.args.get('profile', default=BLOCKING_PROFILE).lower()
+        if not image:
+            return RenderOptions(readiness_mode=readiness_mode, blocking_profile=blocking_profile)
+
+        # format and quality select how image tiles are encoded, e.g. format=webp&quality=70
+        image_quality = request.args.get('quality', default=str(IMAGE_QUALITY))
+        try:
+            image_quality = int(image_quality)
+        except ValueError:
+            raise ValueError(f"Image quality must be a whole number from 0 to 100, not {image_quality}.")
+        return RenderOptions(readiness_mode=readiness_mode,
+                             blocking_profile=blocking_profile,
+                             image_format=request.args.get('format', default=IMAGE_FORMAT).lower(),
+                             image_quality=image_quality)
+
+    def get_file_url(self, route: str, safe_filename: str) -> str:
+        base_url = f"http://{DOMAIN}:{PORT}" if DOMAIN else request.host_url.rstrip('/')
+        return f"{base_url}/{route}/{safe_filename}"
+
+    def render_pdf(self, url: str, render_options: RenderOptions) -> (str, int):
+        start_time = time.perf_counter()
+        try:
+            if self.render_worker_client:
+                result = self.render_worker_client.render(url, render_options)
+                if result.safe_filename:
+                    # The worker process wrote the file, and may have pruned older renders of the same URL
+                    self.pdf_converter.asset_index.refresh(AssetIndex.get_hash(result.safe_filename))
+                    self.pdf_converter.asset_index.add(result.safe_filename)
+            else:
+                result = render_with_pool(self.pdf_web_driver_pool, self.pdf_converter, url, render_options)
+        except WebDriverPoolExhausted:
+            CONVERSION_SECONDS.observe(time.perf_counter() - start_time, converter="pdf", outcome="busy")
+            raise
+
+        CONVERSION_SECONDS.observe(time.perf_counter() - start_time, converter="pdf",
+                                   outcome="success" if result.safe_filename else "failure")
+        for stage, seconds in result.stage_seconds.items():
+            CONVERSION_STAGE_SECONDS.observe(seconds, converter="pdf", stage=stage)
+
+        if result.safe_filename:
+            if self.pdf_optimizer:
+                self.pdf_optimizer.submit(result.safe_filename)
+            render_options.blocking_profile.record_render(result.blocked_requests_by_type,
+                                                          result.transferred_requests,
+                                                          result.transferred_bytes)
+            # The validators come from the rendered response itself, so caching costs no extra origin request
+            self.pdf_render_cache.store(url, result.safe_filename, result.status_code,
+                                        etag=result.navigation.headers.get('etag'),
+                                        last_modified=result.navigation.headers.get('last-modified'),
+                                        validation_url=result.navigation.final_url,
+                                        cache_key=render_options.get_cache_key(url))
+        return result.safe_filename, result.status_code
+
+    def render_image(self, url: str, render_options: RenderOptions) -> (str, int):
+        """
+        :return: (filename of the image manifest, status code)
+        :raises WebDriverPoolExhausted: If no driver became available to capture the URL
+        """
+        start_time = time.perf_counter()
+        try:
+            if self.render_worker_client:
+                result = self.render_worker_client.render(url, render_options, converter='image')
+                if result.safe_filename:
+                    # The worker process wrote the files, and may have pruned older captures of the same URL
+                    self.image_converter.asset_index.refresh(AssetIndex.get_hash(result.safe_filename))
+                    self.image_converter.index_manifest(result.safe_filename)
+            else:
+                result = render_with_pool(self.pdf_web_driver_pool, self.image_converter, url, render_options)
+        except WebDriverPoolExhausted:
+            CONVERSION_SECONDS.observe(time.perf_counter() - start_time, converter="image", outcome="busy")
+            raise
+
+        CONVERSION_SECONDS.observe(time.perf_counter() - start_time, converter="image",
+                                   outcome="success" if result.safe_filename else "failure")
+        for stage, seconds in result.stage_seconds.items():
+            CONVERSION_STAGE_SECONDS.observe(seconds, converter="image", stage=stage)
+        return result.safe_filename, result.status_code
+
+    def convert_to_image(self):
+        # Responds with the URL of a JSON manifest listing the image tiles of the page, which are served from /images
         url = request.args.get('url')
         if not url:
             return Response("Missing URL", status=400)
 
-        url = self.sanitize_url(url)
-
         logging.info(f"Received request to convert URL to image: {url}")
+        url = self.sanitize_url(url)
+        logging.info(f"Sanitized URL: {url}")
 
-        driver = self.image_web_driver_manager.driver
+        try:
+            render_options = self.get_render_options(image=True)
+        except ValueError as e:
+            return Response(str(e), status=400, mimetype='text/plain')
 
-        safe_filename, status_code = self.image_converter.convert_webpage(driver, url)
+        # Identical requests made while a capture is in progress share that capture's result
+        single_flight_key = render_options.get_image_cache_key(url)
+        try:
+            safe_filename, status_code = self.image_single_flight.do(single_flight_key,
+                                                                     lambda: self.render_image(url, render_options))
+        except WebDriverPoolExhausted as e:
+            logging.warning(f"Rejecting request to convert {url} to image: {e}")
+            return Response("All WebDrivers are busy. Please try again later.", status=503, mimetype='text/plain')
 
         if safe_filename:
-            base_url = f"http://{DOMAIN}:{PORT}" if DOMAIN else request.host_url.rstrip('/')
-            image_url = f"{base_url}/images/{safe_filename}"
-            response_contents = f"{image_url}*{status_code}*"
+            response_contents = f"{self.get_file_url('images', safe_filename)}*{status_code}*"
             return Response(response_contents, mimetype='text/plain')
         else:
             return Response("Failed to convert webpage to image.", status=500, mimetype='text/plain')
@@ -586,20 +3525,49 @@ class FlaskWebApp:
     def serve_image(self, filename):
         actual_path = os.path.join(IMAGE_STORAGE_DIR, filename)
         logging.info(f"Attempting to serve image file: {actual_path}")
-        if not os.path.exists(actual_path):
+        if not self.image_converter.asset_index.discover(filename):
             logging.error(f"File not found: {actual_path}")
             return Response("File not found.", status=404)
+        self.image_converter.asset_index.touch(filename)
         return send_from_directory(IMAGE_STORAGE_DIR, filename, as_attachment=False)
 
     def serve_pdf(self, filename):
         actual_path = os.path.join(PDF_STORAGE_DIR, filename)
         logging.info(f"Attempting to serve PDF file: {actual_path}")
-        if not os.path.exists(actual_path):
+        if not self.pdf_converter.asset_index.discover(filename):
             logging.error(f"File not found: {actual_path}")
             return Response("File not found.", status=404)
+        self.pdf_converter.asset_index.touch(filename)
         return send_from_directory(PDF_STORAGE_DIR, filename, as_attachment=False)
 
 
+    def serve_pdf_page(self, filename, page_index):
+        # Serves one page of a PDF as a PNG, rendered on first request. page_index starts at 0.
+        # scale sets the zoom, where 1 is 72 DPI, e.g. /pdfs/<file>/pages/0.png?scale=2
+        # Rounded, which limits how many distinct images of a page can be cached
+        scale = round(request.args.get('scale', default=PAGE_IMAGE_DEFAULT_SCALE, type=float), 2)
+        if not 0 < scale <= PAGE_IMAGE_MAX_SCALE:
+            return Response(f"scale must be at least 0.01 and at most {PAGE_IMAGE_MAX_SCALE:g}.", status=400)
+
+        try:
+            image = self.page_rasterizer.get_page_image(filename, page_index, scale)
+        except IndexError:
+            return Response("Page not found.", status=404)
+        except Exception as e:
+            logging.error(f"Error rendering page {page_index} of {filename}: {e}")
+            return Response("Failed to render the page.", status=500)
+        if image is None:
+            return Response("File not found.", status=404)
+        return Response(image, mimetype='image/png')
+
 if __name__ == "__main__":
-    app = FlaskWebApp()
-    app.run()
+    parser = argparse.ArgumentParser(description="Convert webpages to PDFs and images for Resonite.")
+    parser.add_argument('--production', action='store_true',
+                        help="Serve with a multi-threaded WSGI server, and render in separate worker processes.")
+    args = parser.parse_args()
+
+    app = FlaskWebApp(production=args.production)
+    if args.production:
+        app.run_production()
+    else:
+        app.run()